@@ -1,45 +1,58 @@
-from _io import BytesIO
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
 import argparse
-from gtts import gTTS
-import contextlib
 
-from restaurant_assistant.data_processing import data_loader
-from restaurant_assistant.dialog.dialog_state import StartState
-from restaurant_assistant.order_reasoning.order import Order
-from restaurant_assistant.textclass.neural_network_classifier import NeuralNetworkClassifier
-from restaurant_assistant.textclass.decision_tree_classifier import DecisionTreeClassifier
-from restaurant_assistant.textclass.keyword_classifier import KeywordClassifier
-from restaurant_assistant.textclass.majority_classifier import MajorityClassifier
-from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, UtteranceType
+from restaurant_assistant import import_budget, instrumentation
+for _dependency in ['numpy', 'pandas', 'Levenshtein']:
+    import_budget.timed_import(_dependency)
 
-with contextlib.redirect_stdout(None):
-    import pygame
+_start = perf_counter()
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.dialog.session import DialogSession
+from restaurant_assistant.textclass.registry import classifier_names, load_classifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier
+import_budget.record('restaurant_assistant', perf_counter() - _start)
 
 
-def output(text: str, speech: bool, uppercase: bool) -> None:
+@instrumentation.timed('output')
+def output(text: str, speaker, uppercase: bool) -> None:
     """
-    Prints the given text and converts it to spoken output if speech is true.
+    Prints the given text and queues it to be spoken if there is a speaker.
 
     :param text: the text that needs to be communicated to the user
-    :param speech: whether the text should be converted to audio
+    :param speaker: the SpeechWorker speaking the output, or None for no audio
     :param uppercase: whether the text should be printed in all-caps
     """
     conv_text = text.upper() if uppercase else text
     print(conv_text)
 
-    if speech:
-        tts = gTTS(text=text, lang='en', slow=False)
-        mp3 = BytesIO()
-        tts.write_to_fp(mp3)
-        mp3.seek(0)
+    if speaker is not None:
+        speaker.say(text)
+
+
+def start_speech(backend: str):
+    """
+    Starts the background speech worker, and has it synthesize the fixed prompts in advance.
+
+    :param backend: the name of the text-to-speech backend
+    :return: the started SpeechWorker
+    """
+    from restaurant_assistant.speech.backends import BACKENDS
+    from restaurant_assistant.speech.worker import SpeechWorker
+    from restaurant_assistant.dialog.dialog_state import pref_str, repeat_str
+    from restaurant_assistant.dialog.session import welcome_str, restart_str
 
-        pygame.mixer.init()
-        pygame.mixer.music.load(mp3)
-        pygame.mixer.music.play()
+    speaker = SpeechWorker(BACKENDS[backend]())
+    speaker.prefetch([welcome_str, restart_str, repeat_str, *pref_str.values()])
+    return speaker
 
 
 def run_assistant(classifier: UtteranceClassifier, test: bool, speech: bool,
-                  nr_recs: int, restart: bool, uppercase: bool) -> None:
+                  nr_recs: int, restart: bool, uppercase: bool,
+                  import_report: bool = False, export: bool = False,
+                  speech_backend: str = 'gtts', metrics: Optional[Path] = None,
+                  metrics_format: str = 'prometheus', profile: Optional[Path] = None) -> None:
     """
     Runs the restaurant assistant with the given parameters.
 
@@ -49,39 +62,46 @@ def run_assistant(classifier: UtteranceClassifier, test: bool, speech: bool,
     :param nr_recs: the maximum amount of recommendations that the system can give
     :param restart: whether program restarts are allowed
     :param uppercase: whether to convert the program output to uppercase
+    :param import_report: whether to print the time spent on imports before starting
+    :param export: whether to export the trained network for the numpy_network classifier
+    :param speech_backend: the name of the text-to-speech backend
+    :param metrics: the file to write the time spent in each step of the turns to, or None
+    :param metrics_format: the format of the metrics file, prometheus or jsonl
+    :param profile: the file to write a cProfile profile of the session to, or None
     """
-    data = data_loader.load_dialog_data()
-    train_data, test_data = data_loader.generate_dataframes(data)
+    speaker = start_speech(speech_backend) if speech else None
+    train_data, test_data = data_loader.load_dataframes()
     classifier.initialize(train_data)
+    if export:
+        if not hasattr(classifier, 'export'):
+            raise Exception('Only the neural_network classifier can be exported.')
+        classifier.export()
     if test:
-        output('Testing the classifier..', speech, uppercase)
+        output('Testing the classifier..', speaker, uppercase)
         f1_score, accuracy = classifier.test_performance(test_data)
         result = f'F1 score: {round(f1_score, 2)}\nAccuracy: {round(accuracy, 3)}'
-        output(result, speech, uppercase)
-
-    response = 'Welcome to the restaurant assistant. You can ask for restaurants by type of food, '\
-        'area and price range.'
-    output(response, speech, uppercase)
-    current_state = StartState()
-    order = Order(nr_recs)
-    while(True):
-        utterance = input().lower()
-        input_type = classifier.classify(utterance)
-
-        if restart and input_type is UtteranceType.restart:
-            order = Order(nr_recs)
-            current_state = StartState()
-            output('Your order has been cleared. Please state your new order.', speech, uppercase)
-            continue
-        elif input_type is UtteranceType.repeat:
-            output(response, speech, uppercase)
-            continue
-
-        response, current_state = current_state.process_input(utterance, input_type, order)
-        output(response, speech, uppercase)
-
-        if current_state is None:
-            break
+        output(result, speaker, uppercase)
+
+    if import_report:
+        print(import_budget.report())
+
+    recorder = instrumentation.enable() if metrics is not None else None
+    profiler = instrumentation.SessionProfiler() if profile is not None else None
+    session = DialogSession(classifier, nr_recs, restart, profiler)
+    try:
+        output(session.response, speaker, uppercase)
+        while not session.finished:
+            utterance = input()
+            output(session.respond(utterance), speaker, uppercase)
+    finally:
+        if speaker is not None:
+            speaker.close()
+        if recorder is not None:
+            recorder.write(metrics, metrics_format)
+            print(f'Metrics written to {metrics}.')
+        if profiler is not None:
+            profiler.dump(profile)
+            print(f'Profile written to {profile}.')
 
 
 def main():
@@ -91,16 +111,27 @@ def main():
     parser = argparse.ArgumentParser(description='Start the restaurant assistant')
 
     parser.add_argument('-c --classifier', type=str, default='decision_tree',
-                        choices=['neural_network', 'decision_tree', 'keyword', 'majority'],
+                        choices=classifier_names(),
                         dest='classifier', help='Choose which classifier to use to '
                         'classify the user input. Default is decision_tree.')
 
+    parser.add_argument('--feature-mode', type=str, dest='feature_mode',
+                        choices=['vocabulary', 'hashing'],
+                        help='How the decision_tree and neural_network classifiers convert '
+                        'utterances: a column per known word, or hashed words and word pairs in '
+                        'a fixed number of columns. The default is vocabulary.')
+
     parser.add_argument('-t --test', action='store_true', dest='test',
                         help='Test the performance of the classifier.')
 
     parser.add_argument('-s --speech', action='store_true', dest='speech',
                         help='Read all output out loud')
 
+    parser.add_argument('--speech-backend', type=str, default='gtts', dest='speech_backend',
+                        choices=['gtts', 'local'],
+                        help='The text-to-speech backend. local creates tones instead of speech '
+                        'and works offline. The default is gtts.')
+
     parser.add_argument('-n --nr_recs', type=int, default=3, dest='nr_recs',
                         help='Decide the maximum amount of recommendations that '
                         'are given at a time. The default is 3.')
@@ -111,20 +142,89 @@ def main():
     parser.add_argument('-u --uppercase', action='store_true', dest='uppercase',
                         help='Prints all system output in uppercase letters.')
 
+    parser.add_argument('-i --import-report', action='store_true', dest='import_report',
+                        help='Print the time spent on importing each module at startup.')
+
+    parser.add_argument('-e --export', action='store_true', dest='export',
+                        help='Export the trained neural network, so that it can be used by '
+                        'the numpy_network classifier.')
+
+    parser.add_argument('--serve', action='store_true', dest='serve',
+                        help='Serve many dialog sessions over TCP instead of a single session '
+                        'on the command line.')
+
+    parser.add_argument('--host', type=str, default='127.0.0.1', dest='host',
+                        help='The address the server listens on. The default is 127.0.0.1.')
+
+    parser.add_argument('--port', type=int, default=8765, dest='port',
+                        help='The port the server listens on. The default is 8765.')
+
+    parser.add_argument('--session-timeout', type=float, default=600, dest='session_timeout',
+                        help='The seconds after which an inactive session is closed by the '
+                        'server. The default is 600.')
+
+    parser.add_argument('--batch-size', type=int, default=32, dest='batch_size',
+                        help='The largest number of utterances the server classifies at once. '
+                        'The default is 32.')
+
+    parser.add_argument('--batch-window', type=float, default=5, dest='batch_window',
+                        help='The longest time in milliseconds the server waits for more '
+                        'utterances before classifying a batch. The default is 5.')
+
+    parser.add_argument('--cache-size', type=int, default=4096, dest='cache_size',
+                        help='The number of classified utterances that are remembered, so that '
+                        'repeated utterances are not classified again. 0 disables the cache. '
+                        'The default is 4096.')
+
+    parser.add_argument('--cache-policy', type=str, default='lru', dest='cache_policy',
+                        choices=['lru', 'fifo'],
+                        help='Which utterance is forgotten when the cache is full: the least '
+                        'recently used one or the oldest one. The default is lru.')
+
+    parser.add_argument('--cache-normalize', action='store_true', dest='cache_normalize',
+                        help='Look up utterances in the cache without punctuation and extra '
+                        'whitespace, so that more of them are found. An utterance then gets the '
+                        'type of an earlier one that only differed in punctuation, which can '
+                        'differ from what the model would predict for it.')
+
+    parser.add_argument('--metrics', type=Path, dest='metrics',
+                        help='Record the time spent in each step of the dialog turns and write '
+                        'it to the given file when the program stops.')
+
+    parser.add_argument('--metrics-format', type=str, default='prometheus',
+                        dest='metrics_format', choices=instrumentation.FORMATS,
+                        help='The format of the metrics file: histograms in the Prometheus text '
+                        'format, or appended as JSON lines. The default is prometheus.')
+
+    parser.add_argument('--profile', type=Path, dest='profile',
+                        help='Profile the dialog turns with cProfile and write the profile to '
+                        'the given file. With --serve, the directory to write the profiles of '
+                        'sessions that ask for it to.')
+
     args = parser.parse_args()
 
-    if args.classifier == 'neural_network':
-        classifier = NeuralNetworkClassifier()
-    elif args.classifier == 'decision_tree':
-        classifier = DecisionTreeClassifier()
-    elif args.classifier == 'keyword':
-        classifier = KeywordClassifier()
-    elif args.classifier == 'majority':
-        classifier = MajorityClassifier()
-    else:
-        raise Exception(f'The given classifier, {args.classifier}, is unknown.')
-
-    run_assistant(classifier, args.test, args.speech, args.nr_recs, args.restart, args.uppercase)
+    kwargs = dict()
+    if args.feature_mode is not None:
+        if args.classifier not in ('decision_tree', 'neural_network'):
+            parser.error('--feature-mode can only be used with the decision_tree and '
+                         'neural_network classifiers.')
+        kwargs['params'] = {'feature_mode': args.feature_mode}
+    classifier = load_classifier(args.classifier, **kwargs)
+    if args.cache_size > 0:
+        from restaurant_assistant.textclass.cached_classifier import CachedClassifier
+        classifier = CachedClassifier(classifier, args.cache_size, args.cache_policy,
+                                      args.cache_normalize)
+
+    if args.serve:
+        from restaurant_assistant.server import run_server
+        run_server(classifier, args.nr_recs, args.restart, args.host, args.port,
+                   args.session_timeout, args.batch_size, args.batch_window / 1000,
+                   args.metrics, args.metrics_format, args.profile)
+        return
+
+    run_assistant(classifier, args.test, args.speech, args.nr_recs, args.restart, args.uppercase,
+                  args.import_report, args.export, args.speech_backend, args.metrics,
+                  args.metrics_format, args.profile)
 
 
 if __name__ == "__main__":
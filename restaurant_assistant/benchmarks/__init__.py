@@ -0,0 +1,3 @@
+"""
+Headless benchmarks of the classifiers and the dialog pipeline.
+"""
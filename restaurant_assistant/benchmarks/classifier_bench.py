@@ -0,0 +1,253 @@
+"""
+Measures the cost and the quality of the registered classifiers on the test split of the
+dialog data. For every classifier it reports the time to train and to load a stored model, the
+latency of classifying single utterances, the throughput of classifying batches, the memory
+used while training, and the macro F1 score and accuracy. Every classifier is trained in a
+fresh process, and its stored model is then loaded and measured in another fresh process, so
+that the load time includes importing the modules of the classifier, and import times and
+memory do not depend on the classifiers measured before it. The stored files are still in
+the page cache of the operating system when they are loaded. Run it with:
+
+    python -m restaurant_assistant.benchmarks.classifier_bench -o classifiers.json
+
+and compare a later run against the saved results with --baseline classifiers.json.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+from restaurant_assistant.benchmarks.latency import summarize
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.data_processing.data_loader import Column
+from restaurant_assistant.textclass.registry import classifier_names, load_classifier
+from restaurant_assistant.textclass.artifact_store import ArtifactStore
+
+
+SAMPLES = 1000
+BATCH_SIZE = 256
+TOLERANCE = 0.25
+SCORE_TOLERANCE = 0.005
+
+
+def peak_rss() -> Optional[int]:
+    """
+    :return: the peak resident memory of the current process in bytes, or None on platforms
+        without the resource module
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def initialize(name: str, train_data, store_location: Path, trace: bool = True) \
+        -> Dict[str, Any]:
+    """
+    Creates and initializes a classifier, with its artifacts in the given location.
+
+    :param trace: whether to trace the memory, which slows down initializing
+    :return: the classifier and the seconds and traced memory initializing took
+    """
+    classifier = load_classifier(name)
+    if hasattr(classifier, 'store'):
+        classifier.store = ArtifactStore(store_location)
+    if hasattr(classifier, 'checkpoint_path'):
+        classifier.checkpoint_path = store_location.joinpath(classifier.checkpoint_path.name)
+
+    if trace:
+        tracemalloc.start()
+    start = perf_counter()
+    classifier.initialize(train_data)
+    seconds = perf_counter() - start
+    peak = None
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'classifier': classifier, 'seconds': seconds, 'traced_peak_bytes': peak}
+
+
+def train(name: str, store_location: Path) -> Dict[str, Any]:
+    """
+    Trains a classifier and stores its model in the given location. This runs in its own
+    process.
+
+    :return: the seconds and traced memory training took
+    """
+    train_data, _ = data_loader.load_dataframes()
+    try:
+        trained = initialize(name, train_data, store_location)
+    except (ImportError, FileNotFoundError) as error:
+        return {'error': f'{type(error).__name__}: {error}'}
+    return {'train_s': trained['seconds'], 'train_traced_peak_bytes': trained['traced_peak_bytes']}
+
+
+def measure(name: str, store_location: Path, samples: int = SAMPLES,
+            batch_size: int = BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Loads the stored model of a classifier and measures it. This runs in a fresh process, so
+    the load time includes importing the modules of the classifier.
+
+    :param name: the registered name of the classifier
+    :param store_location: the location the model was stored in by train
+    :param samples: the number of test utterances that are classified one at a time
+    :param batch_size: the number of utterances per batch when measuring the throughput
+    :return: the measurements
+    """
+    from restaurant_assistant.import_budget import import_times
+
+    train_data, test_data = data_loader.load_dataframes()
+    utterances = list(test_data[Column.utterance])
+
+    start = perf_counter()
+    try:
+        loaded = initialize(name, train_data, store_location, trace=False)
+    except (ImportError, FileNotFoundError) as error:
+        return {'error': f'{type(error).__name__}: {error}'}
+    load_s = perf_counter() - start
+    classifier = loaded['classifier']
+
+    latencies = list()
+    for utterance in utterances[:samples]:
+        start = perf_counter()
+        classifier.classify(utterance)
+        latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    for index in range(0, len(utterances), batch_size):
+        classifier.classify_batch(utterances[index:index + batch_size])
+    batch_seconds = perf_counter() - start
+
+    f1, accuracy = classifier.test_performance(test_data)
+
+    return {
+        'import_s': sum(import_times.values()),
+        'load_s': load_s,
+        'peak_rss_bytes': peak_rss(),
+        'latency': summarize(latencies),
+        'batch_size': batch_size,
+        'throughput_per_s': len(utterances) / batch_seconds,
+        'f1': float(f1),
+        'accuracy': float(accuracy),
+    }
+
+
+def run_fresh(function, *args) -> Dict[str, Any]:
+    """
+    Runs the function in a new process and returns its result.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(function, *args).result()
+
+
+def measure_all(names: List[str], samples: int, batch_size: int) -> Dict[str, Dict[str, Any]]:
+    results = dict()
+    for name in names:
+        print(f'Measuring {name}...')
+        with tempfile.TemporaryDirectory() as location:
+            trained = run_fresh(train, name, Path(location))
+            if 'error' in trained:
+                results[name] = trained
+                continue
+            measured = run_fresh(measure, name, Path(location), samples, batch_size)
+        results[name] = measured if 'error' in measured else dict(trained, **measured)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict],
+            tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Compares the latency, throughput and scores of every classifier against a baseline.
+
+    :param results: the classifiers of the current run
+    :param baseline: the classifiers of an earlier run
+    :param tolerance: the allowed relative slowdown
+    :return: a description of every regression
+    """
+    regressions = list()
+    for name in sorted(results.keys() & baseline.keys()):
+        new, old = results[name], baseline[name]
+        if 'error' in new or 'error' in old:
+            continue
+        for key in ('p50_ms', 'p90_ms'):
+            if new['latency'][key] > old['latency'][key] * (1 + tolerance):
+                regressions.append(f'{name} latency {key}: {old["latency"][key]:.3f} -> '
+                                   f'{new["latency"][key]:.3f}')
+        if new['throughput_per_s'] < old['throughput_per_s'] / (1 + tolerance):
+            regressions.append(f'{name} throughput: {old["throughput_per_s"]:.0f} -> '
+                               f'{new["throughput_per_s"]:.0f}')
+        for key in ('f1', 'accuracy'):
+            if new[key] < old[key] - SCORE_TOLERANCE:
+                regressions.append(f'{name} {key}: {old[key]:.4f} -> {new[key]:.4f}')
+    return regressions
+
+
+def print_results(results: Dict[str, dict]) -> None:
+    print(f'{"":<16}{"train s":>9}{"load s":>9}{"p50 ms":>9}{"p99 ms":>9}{"per s":>10}'
+          f'{"MB":>8}{"F1":>8}{"acc":>8}')
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<16}{result["error"]}')
+            continue
+        print(f'{name:<16}{result["train_s"]:>9.3f}{result["load_s"]:>9.3f}'
+              f'{result["latency"]["p50_ms"]:>9.3f}{result["latency"]["p99_ms"]:>9.3f}'
+              f'{result["throughput_per_s"]:>10.0f}'
+              f'{result["train_traced_peak_bytes"] / 2 ** 20:>8.1f}'
+              f'{result["f1"]:>8.4f}{result["accuracy"]:>8.4f}')
+
+
+def run(names: List[str], samples: int, batch_size: int, output: Optional[Path],
+        baseline: Optional[Path], tolerance: float) -> int:
+    results = measure_all(names, samples, batch_size)
+    print_results(results)
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump({'config': {'samples': samples, 'batch_size': batch_size,
+                                  'python': platform.python_version()},
+                       'classifiers': results}, file, indent=2, sort_keys=True)
+        print(f'Results written to {output}.')
+
+    if baseline is not None:
+        with open(baseline, 'r') as file:
+            regressions = compare(results, json.load(file)['classifiers'], tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            return 1
+        print('No regressions compared to the baseline.')
+    return 0
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measures the cost and quality of the '
+                                                 'classifiers.')
+    parser.add_argument('-c', '--classifiers', nargs='+', choices=classifier_names(),
+                        default=classifier_names(), help='the classifiers to measure')
+    parser.add_argument('--samples', type=int, default=SAMPLES,
+                        help='the number of utterances that are classified one at a time')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='the number of utterances per batch')
+    parser.add_argument('-o', '--output', type=Path, help='the json file to write results to')
+    parser.add_argument('-b', '--baseline', type=Path,
+                        help='a json file written by an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='the allowed relative slowdown compared to the baseline')
+    parsed = parser.parse_args(args)
+    return run(parsed.classifiers, parsed.samples, parsed.batch_size, parsed.output,
+               parsed.baseline, parsed.tolerance)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Replays scripted conversations through the dialog states and reports how long the turns take.
+Each script is a text file with one user turn per line; empty lines and lines starting with #
+are skipped. The time of every turn is split into the instrumentation spans of the dialog, like
+classify, process_input and compute_options, and summarized per turn and per dialog state. The
+time of each span excludes the time of the spans nested in it. Run it with:
+
+    python -m restaurant_assistant.benchmarks.dialog_replay -o baseline.json
+
+and compare a later run against the saved baseline with --baseline baseline.json.
+"""
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional
+
+from restaurant_assistant import instrumentation
+from restaurant_assistant.benchmarks.latency import PERCENTILES, summarize
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.data_processing.data_loader import data_path
+from restaurant_assistant.dialog.session import DialogSession
+from restaurant_assistant.textclass.registry import classifier_names, load_classifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier
+
+
+SCRIPT_LOCATION = data_path.joinpath('dialog_scripts')
+TOLERANCE = 0.25
+MIN_DIFFERENCE = 0.05
+
+# The time of a turn that is not spent in any span.
+OTHER = 'other'
+
+
+def read_script(path: Path) -> List[str]:
+    """
+    Reads the user turns of a script.
+
+    :param path: the script file
+    :return: the turns in order
+    """
+    with open(path, 'r') as file:
+        return [line.strip() for line in file
+                if line.strip() and not line.lstrip().startswith('#')]
+
+
+def replay(classifier: UtteranceClassifier, scripts: Dict[str, List[str]], nr_recs: int,
+           repeat: int) -> List[dict]:
+    """
+    Replays every script the given number of times and times each turn.
+
+    :param classifier: the initialized classifier
+    :param scripts: the turns of each script by name
+    :param nr_recs: the maximum amount of recommendations that the system can give
+    :param repeat: how often each script is replayed
+    :return: one record per turn with the script, state, total time and time per span
+    """
+    recorder = instrumentation.Recorder()
+    previous = instrumentation.active()
+    instrumentation.enable(recorder)
+    turns = list()
+    try:
+        for _ in range(repeat):
+            for name, script in scripts.items():
+                session = DialogSession(classifier, nr_recs, False)
+                for utterance in script:
+                    if session.finished:
+                        break
+                    state = type(session.state).__name__
+                    recorder.take_exclusive()
+                    start = perf_counter()
+                    session.respond(utterance)
+                    total = perf_counter() - start
+                    times = recorder.take_exclusive()
+                    times[OTHER] = max(total - sum(times.values()), 0.0)
+                    turns.append({'script': name, 'state': state, 'total': total,
+                                  'times': times})
+    finally:
+        if previous is None:
+            instrumentation.disable()
+        else:
+            instrumentation.enable(previous)
+    return turns
+
+
+def summarize_turns(turns: List[dict]) -> Dict[str, dict]:
+    """
+    Summarizes all turns, the turns of each state, and the time of each span per turn.
+    """
+    spans = sorted({name for turn in turns for name in turn['times']} - {OTHER}) + [OTHER]
+
+    def breakdown(selection: List[dict]) -> Dict[str, dict]:
+        return {name: summarize([turn['times'].get(name, 0.0) for turn in selection])
+                for name in spans}
+
+    states = dict()
+    for turn in turns:
+        states.setdefault(turn['state'], list()).append(turn)
+
+    return {
+        'turns': summarize([turn['total'] for turn in turns]),
+        'spans': breakdown(turns),
+        'states': {state: {'turns': summarize([turn['total'] for turn in selection]),
+                           'spans': breakdown(selection)}
+                   for state, selection in sorted(states.items())},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Compares the median and 90th percentile of the turns, spans and states against a
+    baseline.
+
+    :param results: the results of the current run
+    :param baseline: the results of an earlier run
+    :param tolerance: the allowed relative slowdown. Slowdowns below MIN_DIFFERENCE
+        milliseconds are ignored as noise
+    :return: a description of every regression
+    """
+    def pairs(summary: dict, prefix: str) -> Iterator:
+        yield prefix, summary['turns']
+        for name, values in summary['spans'].items():
+            yield f'{prefix}/{name}', values
+
+    current = dict(pairs(results, 'all'))
+    previous = dict(pairs(baseline, 'all'))
+    for state, summary in results['states'].items():
+        current.update(pairs(summary, state))
+    for state, summary in baseline['states'].items():
+        previous.update(pairs(summary, state))
+
+    regressions = list()
+    for name in sorted(current.keys() & previous.keys()):
+        for key in ('p50_ms', 'p90_ms'):
+            new, old = current[name][key], previous[name][key]
+            if new > old * (1 + tolerance) and new - old > MIN_DIFFERENCE:
+                regressions.append(f'{name} {key}: {old:.3f} -> {new:.3f}')
+    return regressions
+
+
+def print_summary(results: dict) -> None:
+    header = f'{"":<28}{"count":>7}{"mean":>10}' + \
+        ''.join(f'{"p" + str(percentile):>10}' for percentile in PERCENTILES)
+
+    def row(name: str, summary: Dict[str, float]) -> str:
+        return f'{name:<28}{summary["count"]:>7}{summary["mean_ms"]:>10.3f}' + \
+            ''.join(f'{summary[f"p{percentile}_ms"]:>10.3f}' for percentile in PERCENTILES)
+
+    print(header)
+    print(row('all turns', results['turns']))
+    for name, summary in results['spans'].items():
+        print(row(f'  {name}', summary))
+    for state, summary in results['states'].items():
+        print(row(state, summary['turns']))
+        for name, values in summary['spans'].items():
+            print(row(f'  {name}', values))
+
+
+def run(classifier_name: str, script_dir: Path, nr_recs: int, repeat: int,
+        output: Optional[Path], baseline: Optional[Path], tolerance: float) -> int:
+    scripts = {path.stem: read_script(path) for path in sorted(script_dir.glob('*.txt'))}
+    if not scripts:
+        print(f'No scripts found in {script_dir}.')
+        return 1
+
+    classifier = load_classifier(classifier_name)
+    train_data, _ = data_loader.load_dataframes()
+    classifier.initialize(train_data)
+
+    # The first replay loads the catalog and warms up the caches.
+    replay(classifier, scripts, nr_recs, 1)
+    turns = replay(classifier, scripts, nr_recs, repeat)
+
+    results = summarize_turns(turns)
+    results['config'] = {'classifier': classifier_name, 'scripts': sorted(scripts),
+                         'repeat': repeat, 'nr_recs': nr_recs,
+                         'python': platform.python_version()}
+    print_summary(results)
+
+    if output is not None:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f'Results written to {output}.')
+
+    if baseline is not None:
+        with open(baseline, 'r') as file:
+            regressions = compare(results, json.load(file), tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            return 1
+        print('No regressions compared to the baseline.')
+    return 0
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replays scripted dialogs and reports the '
+                                                 'latency of each turn.')
+    parser.add_argument('-c', '--classifier', choices=classifier_names(),
+                        default='decision_tree', help='the classifier to use')
+    parser.add_argument('-d', '--scripts', type=Path, default=SCRIPT_LOCATION,
+                        help='the directory containing the scripts')
+    parser.add_argument('-n', '--nr_recs', type=int, default=3,
+                        help='the maximum amount of recommendations that the system can give')
+    parser.add_argument('-r', '--repeat', type=int, default=20,
+                        help='how often every script is replayed')
+    parser.add_argument('-o', '--output', type=Path, help='the json file to write results to')
+    parser.add_argument('-b', '--baseline', type=Path,
+                        help='a json file written by an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='the allowed relative slowdown compared to the baseline')
+    parsed = parser.parse_args(args)
+    return run(parsed.classifier, parsed.scripts, parsed.nr_recs, parsed.repeat, parsed.output,
+               parsed.baseline, parsed.tolerance)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
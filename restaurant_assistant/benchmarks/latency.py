@@ -0,0 +1,19 @@
+from typing import Dict, Sequence
+import numpy
+
+
+PERCENTILES = (50, 90, 99)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """
+    Summarizes latencies in milliseconds.
+
+    :param values: the latencies in seconds
+    :return: the count, mean and percentiles
+    """
+    values = numpy.asarray(values, dtype=numpy.float64) * 1000
+    summary = {'count': int(len(values)), 'mean_ms': float(values.mean())}
+    for percentile, value in zip(PERCENTILES, numpy.percentile(values, PERCENTILES)):
+        summary[f'p{percentile}_ms'] = float(value)
+    return summary
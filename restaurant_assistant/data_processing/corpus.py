@@ -0,0 +1,212 @@
+"""
+Streams labelled utterances out of corpus files, and keeps a pre-tokenized binary copy of them
+on disk. Every line of a corpus file contains a label, a space and the utterance. The binary
+copy stores the label and token ids of all records in flat arrays that are memory-mapped when
+read. This saves parsing the text again, but it does not bound the memory of the program: the
+classifiers work on utterance strings, so load_dataframe still turns the ids of every record
+back into a string.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy
+
+
+CACHE_VERSION = 1
+LABEL_DTYPE = numpy.uint8
+MAX_LABELS = int(numpy.iinfo(LABEL_DTYPE).max) + 1
+OFFSET_DTYPE = numpy.int64
+TOKEN_DTYPE = numpy.int32
+
+META_FILE = 'meta.json'
+LABELS_FILE = 'labels.npy'
+OFFSETS_FILE = 'offsets.npy'
+TOKENS_FILE = 'tokens.npy'
+
+
+def iter_records(paths: Iterable[Path]) -> Iterator[Tuple[str, str]]:
+    """
+    Reads the records of the corpus files one line at a time.
+
+    :param paths: the corpus files, read in order
+    :return: generator of (label, utterance) pairs
+    """
+    for path in paths:
+        with open(path, 'r') as file:
+            for line in file:
+                line = line.rstrip('\n')
+                if line:
+                    label, utterance = line.split(' ', 1)
+                    yield label, utterance
+
+
+def tokenize(utterance: str) -> List[str]:
+    """
+    Splits an utterance on single spaces, so that joining the tokens with spaces gives back the
+    exact utterance.
+    """
+    return utterance.split(' ')
+
+
+class Corpus:
+    """
+    Labelled utterances stored as ids. The tokens of record i are
+    tokens[offsets[i]:offsets[i + 1]], so a range of records is a slice of the arrays, and
+    creating one does not copy any data.
+
+    :var Sequence[str] label_names: the label of each label id
+    :var Sequence[str] words: the token of each token id
+    :var numpy.ndarray labels: the label id of each record
+    :var numpy.ndarray offsets: the start of the tokens of each record, followed by the end of
+        the last record
+    :var numpy.ndarray tokens: the token ids of all records after each other
+    """
+
+    def __init__(self, label_names: Sequence[str], words: Sequence[str], labels: numpy.ndarray,
+                 offsets: numpy.ndarray, tokens: numpy.ndarray):
+        self.label_names = label_names
+        self.words = words
+        self.labels = labels
+        self.offsets = offsets
+        self.tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        return self.label_names[self.labels[index]], self.utterance(index)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return (self[index] for index in range(len(self)))
+
+    def utterance(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return ' '.join([self.words[token] for token in self.tokens[start:end]])
+
+    def select(self, start: int, stop: int) -> Corpus:
+        """
+        Creates a corpus of a range of records, sharing the arrays of this corpus.
+
+        :param start: the first record
+        :param stop: the record after the last one
+        :return: the created corpus
+        """
+        offsets = self.offsets[start:stop + 1]
+        tokens = self.tokens[offsets[0]:offsets[-1]] if len(offsets) else self.tokens[:0]
+        return Corpus(self.label_names, self.words, self.labels[start:stop],
+                      offsets - offsets[0] if len(offsets) else offsets, tokens)
+
+    def split(self, fraction: float) -> Tuple[Corpus, Corpus]:
+        """
+        Splits the corpus in two consecutive parts.
+
+        :param fraction: the part of the records in the first corpus
+        :return: the first and second part
+        """
+        boundary = int(fraction * len(self))
+        return self.select(0, boundary), self.select(boundary, len(self))
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str]]) -> Corpus:
+        """
+        Converts records into ids. The ids are collected in compact arrays while reading, so
+        the records themselves are never all in memory.
+
+        :param records: the (label, utterance) pairs
+        :return: the created corpus
+        """
+        label_ids, token_ids = dict(), dict()
+        labels, offsets, tokens = array('B'), array('q', [0]), array('i')
+        for label, utterance in records:
+            label_id = label_ids.setdefault(label, len(label_ids))
+            if label_id >= MAX_LABELS:
+                raise ValueError(f'The corpus has more than {MAX_LABELS} different labels, '
+                                 'which is the most that can be stored.')
+            labels.append(label_id)
+            tokens.extend([token_ids.setdefault(token, len(token_ids))
+                           for token in tokenize(utterance)])
+            offsets.append(len(tokens))
+
+        return cls(list(label_ids), list(token_ids),
+                   numpy.frombuffer(labels, dtype=LABEL_DTYPE),
+                   numpy.frombuffer(offsets, dtype=OFFSET_DTYPE),
+                   numpy.frombuffer(tokens, dtype=TOKEN_DTYPE))
+
+    def save(self, directory: Path) -> None:
+        numpy.save(directory.joinpath(LABELS_FILE), self.labels)
+        numpy.save(directory.joinpath(OFFSETS_FILE), self.offsets)
+        numpy.save(directory.joinpath(TOKENS_FILE), self.tokens)
+        with open(directory.joinpath(META_FILE), 'w') as file:
+            json.dump({'version': CACHE_VERSION, 'label_names': list(self.label_names),
+                       'words': list(self.words)}, file)
+
+    @classmethod
+    def load(cls, directory: Path) -> Corpus:
+        """
+        Reads a corpus written by save, memory-mapping its arrays.
+
+        :param directory: the directory the corpus was saved to
+        :return: the read corpus
+        """
+        with open(directory.joinpath(META_FILE), 'r') as file:
+            meta = json.load(file)
+        if meta['version'] != CACHE_VERSION:
+            raise ValueError(f'Unsupported cache version {meta["version"]}.')
+        return cls(meta['label_names'], meta['words'],
+                   numpy.load(directory.joinpath(LABELS_FILE), mmap_mode='r'),
+                   numpy.load(directory.joinpath(OFFSETS_FILE), mmap_mode='r'),
+                   numpy.load(directory.joinpath(TOKENS_FILE), mmap_mode='r'))
+
+
+def cache_key(paths: Sequence[Path]) -> str:
+    """
+    Computes a key that changes whenever one of the corpus files changes.
+
+    :param paths: the corpus files
+    :return: hexadecimal hash of the paths, sizes and modification times
+    """
+    digest = hashlib.sha256(f'corpus {CACHE_VERSION}\n'.encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{Path(path).resolve()} {stat.st_size} {stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def load_corpus(paths: Sequence[Path], cache_location: Optional[Path] = None) -> Corpus:
+    """
+    Loads the records of the corpus files. When a cache location is given the pre-tokenized
+    corpus is read from it, and written to it first if the files were not cached yet.
+
+    :param paths: the corpus files, read in order
+    :param cache_location: the directory containing the cached corpora
+    :return: the corpus
+    """
+    if cache_location is None:
+        return Corpus.build(iter_records(paths))
+
+    cache_location = Path(cache_location)
+    path = cache_location.joinpath(f'corpus-{cache_key(paths)[:20]}')
+    if path.is_dir():
+        try:
+            return Corpus.load(path)
+        except (OSError, ValueError) as error:
+            print(f'Could not read the cached corpus in {path}: {error}')
+
+    corpus = Corpus.build(iter_records(paths))
+    cache_location.mkdir(parents=True, exist_ok=True)
+    temporary = Path(tempfile.mkdtemp(prefix='.corpus-', dir=cache_location))
+    try:
+        corpus.save(temporary)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+    except OSError as error:
+        print(f'Could not cache the corpus in {path}: {error}')
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return corpus
@@ -1,11 +1,17 @@
 import pandas as pd
 from pathlib import Path
 from enum import Enum, auto
-from typing import Tuple
+from typing import Iterable, Optional, Sequence, Tuple, Union
 import numpy
 import pandas
 
+from restaurant_assistant.data_processing.corpus import Corpus, iter_records, load_corpus
+
 data_path = Path(__file__).parent.parent.parent.joinpath('data')
+restaurant_info_path = data_path.joinpath('restaurant_info.csv')
+dialog_data_path = data_path.joinpath('dialogs.dat')
+CACHE_LOCATION = data_path.joinpath('cache')
+TRAIN_FRACTION = 0.8
 
 
 class Column(Enum):
@@ -13,23 +19,72 @@ class Column(Enum):
     utterance = auto()
 
 
-def load_dialog_data():
-    tuppled_data = list()
-    path = str(data_path.joinpath('dialogs.dat'))
-    with open(path, "r") as raw_dialog_data:
-        for line in raw_dialog_data:
-            (label, utterance) = line.split(' ', 1)  # divides the data into two strings
-            utterance = utterance[:-1]  # removes the \n character
-            tuppled_data.append([label, utterance])  # creates a tupple
-    return tuppled_data
+def load_dialog_data(paths: Optional[Sequence[Path]] = None):
+    paths = paths or [dialog_data_path]
+    return [[label, utterance] for label, utterance in iter_records(paths)]
+
+
+def corpus_dataframe(corpus: Corpus) -> pd.DataFrame:
+    """
+    Creates a DataFrame with a label and an utterance column out of a corpus. The string of
+    every utterance is built from its token ids, so the DataFrame takes as much memory as the
+    parsed text, whether or not the corpus is memory-mapped.
+
+    :param corpus: the corpus to convert
+    :return: the created DataFrame
+    """
+    words = corpus.words
+    tokens = corpus.tokens.tolist()
+    offsets = corpus.offsets.tolist()
+    utterances = [' '.join(map(words.__getitem__, tokens[start:end]))
+                  for start, end in zip(offsets[:-1], offsets[1:])]
+    labels = numpy.asarray(corpus.label_names, dtype=object)[corpus.labels]
+    return pd.DataFrame({Column.label: labels, Column.utterance: utterances})
+
+
+def split_dataframe(df: pd.DataFrame, fraction: float = TRAIN_FRACTION) \
+        -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Splits the data in a training and a test part. The parts are slices of the given
+    DataFrame, so no data is copied.
+    """
+    boundary = int(fraction * len(df))
+    return df.iloc[:boundary], df.iloc[boundary:]
+
+
+def generate_dataframes(tuppled_data: Union[Corpus, Iterable]) \
+        -> Tuple[pd.DataFrame, pd.DataFrame]:
+    if isinstance(tuppled_data, Corpus):
+        df = corpus_dataframe(tuppled_data)
+    else:
+        df = pd.DataFrame.from_records(tuppled_data, columns=[Column.label, Column.utterance])
+    return split_dataframe(df)
+
+
+def load_dataframe(paths: Optional[Sequence[Path]] = None, cache: bool = True) -> pd.DataFrame:
+    """
+    Loads the dialog data through the pre-tokenized cache.
+
+    :param paths: the corpus files, by default the bundled dialog data
+    :param cache: whether to read and write the pre-tokenized cache
+    :return: the data with a label and an utterance column
+    """
+    return corpus_dataframe(load_corpus(paths or [dialog_data_path],
+                                        CACHE_LOCATION if cache else None))
+
 
+def load_dataframes(paths: Optional[Sequence[Path]] = None, cache: bool = True) \
+        -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Loads the dialog data through the pre-tokenized cache and splits it in a training and a
+    test part.
 
-def generate_dataframes(tuppled_data) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    df = pd.DataFrame.from_records(tuppled_data, columns=[Column.label, Column.utterance])
-    train_data, test_data = numpy.split(df, [int(0.8*len(df))])
-    return train_data, test_data
+    :param paths: the corpus files, by default the bundled dialog data
+    :param cache: whether to read and write the pre-tokenized cache
+    :return: the training and the test data
+    """
+    return split_dataframe(load_dataframe(paths, cache))
 
 
 def load_restaurant_info():
-    path = str(data_path.joinpath('restaurant_info.csv'))
-    return pandas.read_csv(path)
+    return pandas.read_csv(str(restaurant_info_path))
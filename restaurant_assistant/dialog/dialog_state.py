@@ -1,7 +1,6 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import Tuple
-from pandas import isna
 
 from restaurant_assistant.textclass.utterance_classifier import UtteranceType
 from restaurant_assistant.order_reasoning.order import Order, InfoType, info_keywords
@@ -40,7 +39,7 @@ class DialogState(ABC):
         order.process_inform(utterance)
         empty_prefs = order.get_empty_preferences()
         order.compute_options()
-        option_count = order.options.shape[0]
+        option_count = len(order.option_ids)
         if option_count >= 2:
             if not empty_prefs:
                 next_state = ConfirmOrderState()
@@ -94,12 +93,12 @@ class DialogState(ABC):
                 'Please change your query.'
             next_state = AskPreferenceState()
 
-        elif previous is not None and recommendation.equals(previous):
+        elif previous is not None and recommendation == previous:
             return_str = 'The given recommendation is the only option.'
             next_state = RecommendationState()
 
         else:
-            return_str = Order.str_restaurant(order.recommendation) + \
+            return_str = order.str_restaurant(order.recommendation) + \
                 ' Do you want this restaurant?'
             next_state = RecommendationState()
 
@@ -223,7 +222,7 @@ class GetChoiceState(DialogState):
         try:
             choice = int(utterance)
             order.set_recommendation(choice)
-            return_str = f'You have chosen {order.recommendation[InfoType.restaurantname]}. ' \
+            return_str = f'You have chosen {order.get_info(InfoType.restaurantname)}. ' \
                 'You can ask for their phone number, address and postal code.'
             next_state = InformChoiceState()
 
@@ -244,7 +243,7 @@ class RecommendationState(DialogState):
             return_str, next_state = self.give_new_recommendation(order)
 
         elif input_type is UtteranceType.affirm:
-            return_str = f'You have chosen {order.recommendation[InfoType.restaurantname]}. ' \
+            return_str = f'You have chosen {order.get_info(InfoType.restaurantname)}. ' \
                 'You can ask for their phone number, address and postal code.'
             next_state = InformChoiceState()
 
@@ -271,8 +270,7 @@ class InformChoiceState(DialogState):
                 return_str = repeat_str
             else:
                 for key, _ in matches:
-                    value = order.recommendation[key] \
-                        if not isna(order.recommendation[key]) else 'unknown'
+                    value = order.get_info(key) or 'unknown'
                     if key is InfoType.phone:
                         info.append(f'the phone number is {value}.')
                     if key is InfoType.addr:
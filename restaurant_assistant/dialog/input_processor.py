@@ -1,22 +1,140 @@
 from __future__ import annotations
 import Levenshtein
-from typing import Dict, List, Tuple, Any
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Any, Union
+
+from restaurant_assistant.instrumentation import timed
 
 
 MATCH_DIST = 2
 
 
-def find_keywords(literal_match: Dict[Any, List[str]],
+class KeywordIndex:
+    """
+    Index over a list of literals to find the literals that occur in an utterance, either
+    precisely or within MATCH_DIST of a phrase in the utterance. Literals of multiple words are
+    compared to phrases of the same amount of consecutive words of the utterance.
+
+    Fuzzy lookups use a deletion index: every literal is stored under all strings that can be
+    created by deleting up to MATCH_DIST characters from it. Two strings are only within
+    MATCH_DIST of each other if they share such a string, so the Levenshtein distance only
+    has to be calculated for the literals found through the deletions of a phrase. There is a
+    separate deletion index per word count, so that a phrase is only compared to literals with
+    as many words, and 'for an' never matches 'korean'.
+
+    :var List[str] literals: the unique literals in their original order
+    :var Dict[str, int] order: maps each literal to its position, used to break ties
+    :var List[int] lengths: the different word counts of the literals, longest first
+    :var Dict[int, Dict[str, List[str]]] deletions: maps word count and deletion to the
+        literals with that word count it was created from
+    """
+
+    def __init__(self, literals: Iterable[str], max_distance: int = MATCH_DIST):
+        self.literals = list(dict.fromkeys(literals))
+        self.order = {literal: index for index, literal in enumerate(self.literals)}
+        self.lengths = sorted(set(len(literal.split()) for literal in self.literals),
+                              reverse=True)
+        self.max_distance = max_distance
+        self.deletions = defaultdict(lambda: defaultdict(list))
+        for literal in self.literals:
+            deletions = self.deletions[len(literal.split())]
+            for deletion in generate_deletions(literal, max_distance):
+                deletions[deletion].append(literal)
+
+    def phrases(self, words: List[str]) -> Iterator[str]:
+        """
+        Generates all phrases of the utterance that have as many words as one of the literals,
+        longest phrases first.
+
+        :param words: the words of the utterance
+        :return: generator of phrases
+        """
+        for length in self.lengths:
+            for start in range(len(words) - length + 1):
+                yield ' '.join(words[start:start + length])
+
+    def find_exact(self, words: List[str]) -> Optional[str]:
+        """
+        Finds a literal that occurs precisely in the utterance, preferring the literals with
+        the most words.
+
+        :param words: the words of the utterance
+        :return: the matched literal, or None if no literal occurs
+        """
+        for phrase in self.phrases(words):
+            if phrase in self.order:
+                return phrase
+        return None
+
+    def find_closest(self, words: List[str]) -> Tuple[int, Optional[str]]:
+        """
+        Finds the literal with the smallest Levenshtein distance to any phrase of the utterance.
+        Only distances up to max_distance are considered, ties are won by the earliest literal.
+
+        :param words: the words of the utterance
+        :return: the distance and the literal, or (max_distance + 1, None) if none are close
+        """
+        best = (self.max_distance + 1, len(self.literals), None)
+        for phrase in self.phrases(words):
+            deletions = self.deletions[len(phrase.split())]
+            candidates = set()
+            for deletion in generate_deletions(phrase, self.max_distance):
+                candidates.update(deletions.get(deletion, ()))
+            for literal in candidates:
+                distance = Levenshtein.distance(literal, phrase)
+                if distance <= self.max_distance:
+                    best = min(best, (distance, self.order[literal], literal))
+
+        return best[0], best[2]
+
+
+def generate_deletions(word: str, max_distance: int) -> Set[str]:
+    """
+    Creates all strings that can be made by deleting up to max_distance characters of the word.
+
+    :param word: the original string
+    :param max_distance: the maximum number of deleted characters
+    :return: the set of deletions, including the word itself
+    """
+    deletions = {word}
+    current = {word}
+    for _ in range(max_distance):
+        current = {x[:i] + x[i + 1:] for x in current for i in range(len(x))}
+        deletions.update(current)
+    return deletions
+
+
+@lru_cache(maxsize=256)
+def _build_index(literals: Tuple[str, ...]) -> KeywordIndex:
+    return KeywordIndex(literals)
+
+
+def get_index(keywords: Union[Iterable[str], KeywordIndex]) -> KeywordIndex:
+    """
+    Returns the index for the given keywords. Indices of lists of keywords are built once and
+    reused for later calls with the same keywords.
+
+    :param keywords: a prebuilt index or the keywords to index
+    :return: the index over the keywords
+    """
+    if isinstance(keywords, KeywordIndex):
+        return keywords
+    return _build_index(tuple(keywords))
+
+
+@timed('find_keywords')
+def find_keywords(literal_match: Dict[Any, Union[List[str], KeywordIndex]],
                   help_match: Dict[Any, List[str]],
                   utterance: str) -> List[Tuple[Any, str]]:
     """
-    First attempts to find a precise match between a word in the utterance and literal_match.
+    First attempts to find a precise match between a phrase in the utterance and literal_match.
     If this is not found, the utterance is searched for words in help_match. If these are found,
-    the Levenshtein distance is calculated between all words of the utterance and the words in
-    literal_match of the matching type. It is matched if a distance is found of less or equal to
+    the literal of the matching type with the smallest Levenshtein distance to a phrase of the
+    utterance is looked up in its index. It is matched if a distance is found of less or equal to
     MATCH_DIST.
 
-    :param literal_match: dict mapping type to keywords
+    :param literal_match: dict mapping type to keywords, or to a prebuilt index of keywords
     :param help_match: dict mapping type to keywords. Same types as literal_match
     :param utterance: the string to be analyzed
     :return: The matched types and the words they were matched to
@@ -25,25 +143,19 @@ def find_keywords(literal_match: Dict[Any, List[str]],
     words = utterance.split()
 
     for key, keywords in literal_match.items():
-        for keyword in keywords:
-            if any(word == keyword for word in words):
-                matches.append((key, keyword))
-                break
-        else:
-            try:
-                help_words = help_match[key]
-            except Exception:
-                continue
-
-            min_distance = (10, None)
-            if any(word in help_words for word in words):
-                for literal in literal_match[key]:
-                    distance = min([Levenshtein.distance(literal, x) for x in words])
-
-                    if distance < min_distance[0]:
-                        min_distance = (distance, literal)
-
-            if min_distance[0] <= MATCH_DIST:
-                matches.append((key, min_distance[1]))
+        index = get_index(keywords)
+        keyword = index.find_exact(words)
+        if keyword is not None:
+            matches.append((key, keyword))
+            continue
+
+        help_words = help_match.get(key)
+        if help_words is None:
+            continue
+
+        if any(word in help_words for word in words):
+            distance, literal = index.find_closest(words)
+            if distance <= MATCH_DIST:
+                matches.append((key, literal))
 
     return matches
@@ -0,0 +1,79 @@
+from contextlib import nullcontext
+from time import monotonic
+from typing import Optional
+
+from restaurant_assistant.dialog.dialog_state import StartState
+from restaurant_assistant.instrumentation import SessionProfiler, span
+from restaurant_assistant.order_reasoning.order import Order
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, UtteranceType
+
+
+welcome_str = 'Welcome to the restaurant assistant. You can ask for restaurants by type of food, '\
+    'area and price range.'
+restart_str = 'Your order has been cleared. Please state your new order.'
+
+
+class DialogSession:
+    """
+    A single conversation with a user. All information about the conversation is kept in the
+    current dialog state and the order, so the classifier can be shared by many sessions.
+
+    :var UtteranceClassifier classifier: the classifier used to classify the user input
+    :var int nr_recs: the maximum amount of recommendations that the system can give
+    :var bool restart: whether restarts are allowed
+    :var DialogState state: the current state, None once the dialog has finished
+    :var Order order: the order of the user
+    :var str response: the last response, which is given again when the user asks to repeat
+    :var float last_active: the monotonic time of the last turn
+    :var SessionProfiler profiler: profiles the turns of this session, or None
+    """
+
+    def __init__(self, classifier: UtteranceClassifier, nr_recs: int, restart: bool,
+                 profiler: Optional[SessionProfiler] = None):
+        self.classifier = classifier
+        self.nr_recs = nr_recs
+        self.restart = restart
+        self.state = StartState()
+        self.order = Order(nr_recs)
+        self.response = welcome_str
+        self.last_active = monotonic()
+        self.profiler = profiler
+
+    @property
+    def finished(self) -> bool:
+        return self.state is None
+
+    def respond(self, utterance: str) -> str:
+        """
+        Classifies the utterance and processes it.
+
+        :param utterance: the user input
+        :return: the system response
+        """
+        with self.profiler or nullcontext():
+            utterance = utterance.lower()
+            with span('classify'):
+                input_type = self.classifier.classify(utterance)
+            return self.process(utterance, input_type)
+
+    def process(self, utterance: str, input_type: UtteranceType) -> str:
+        """
+        Processes an utterance that has already been classified, moving to the next state.
+
+        :param utterance: the user input in lowercase
+        :param input_type: the type of the utterance
+        :return: the system response
+        """
+        with self.profiler or nullcontext():
+            self.last_active = monotonic()
+            if self.restart and input_type is UtteranceType.restart:
+                self.order = Order(self.nr_recs)
+                self.state = StartState()
+                return restart_str
+            elif input_type is UtteranceType.repeat:
+                return self.response
+
+            with span('process_input'):
+                self.response, self.state = self.state.process_input(utterance, input_type,
+                                                                     self.order)
+            return self.response
@@ -0,0 +1,54 @@
+"""
+Keeps track of the time spent on importing modules, so that the startup time of the program
+can be reported per module.
+"""
+import sys
+from importlib import import_module
+from time import perf_counter
+from types import ModuleType
+from typing import Dict
+
+STARTUP_BUDGET = 1.0
+
+import_times: Dict[str, float] = dict()
+
+
+def record(name: str, seconds: float) -> None:
+    """
+    Adds the time spent on importing a module or group of modules.
+
+    :param name: the name to report the time under
+    :param seconds: the time spent
+    """
+    import_times[name] = import_times.get(name, 0.0) + seconds
+
+
+def timed_import(name: str) -> ModuleType:
+    """
+    Imports the module and records the time it took, if it wasn't imported yet.
+
+    :param name: the full name of the module
+    :return: the imported module
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    start = perf_counter()
+    module = import_module(name)
+    record(name, perf_counter() - start)
+    return module
+
+
+def report(budget: float = STARTUP_BUDGET) -> str:
+    """
+    Creates a report of all recorded imports, slowest first.
+
+    :param budget: the total import time in seconds that is considered acceptable
+    :return: the report
+    """
+    total = sum(import_times.values())
+    lines = ['Import time per module:']
+    for name, seconds in sorted(import_times.items(), key=lambda x: x[1], reverse=True):
+        lines.append(f'{seconds:8.3f}s  {100 * seconds / total if total else 0:5.1f}%  {name}')
+    status = 'within' if total <= budget else 'over'
+    lines.append(f'{total:8.3f}s  total, {status} the budget of {budget:.1f}s')
+    return '\n'.join(lines)
@@ -0,0 +1,298 @@
+"""
+Measures where the time of a dialog turn goes. The steps of a turn are marked as named spans,
+either with the timed decorator or with the span context manager. As long as no recorder is
+enabled a span only checks whether one is, so the marks can stay in place in production.
+Once a recorder is enabled, the duration of every span is added to a histogram per name,
+which can be written in the Prometheus text format or as JSON lines. Separately, the turns of
+a single session can be profiled with cProfile.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left
+from functools import wraps
+from pathlib import Path
+from time import perf_counter, time
+from typing import Callable, Dict, List, Optional
+
+METRIC_NAME = 'restaurant_assistant_span_seconds'
+FORMATS = ('prometheus', 'jsonl')
+SPANS = ('classify', 'process_input', 'compute_options', 'compute_alternatives',
+         'find_keywords', 'process_extra', 'render', 'output')
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """
+    Counts durations in buckets with fixed upper bounds.
+
+    :var Tuple[float, ...] bounds: the upper bound in seconds of every bucket but the last,
+        which holds all longer durations
+    :var List[int] counts: the number of durations in each bucket
+    :var int count: the number of durations
+    :var float sum: the total of the durations in seconds
+    """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> List[int]:
+        """
+        :return: the number of durations up to each bound, ending with the total count
+        """
+        totals = list()
+        for count in self.counts:
+            totals.append(count + (totals[-1] if totals else 0))
+        return totals
+
+
+class Recorder:
+    """
+    Collects the durations of the spans. Spans can be nested, for example when computing the
+    options of an order looks up keywords. The histograms hold the full duration of every span,
+    while the exclusive times only count the time that was not spent in nested spans, so that
+    the exclusive times of a turn add up to the time spent in spans.
+
+    Spans are nested per thread, so spans of a classifier running in a worker thread are
+    counted separately from those of the dialog.
+
+    :var Dict[str, Histogram] histograms: the durations of each span
+    :var Dict[str, float] exclusive: the exclusive seconds of each span since the last call
+        of take_exclusive
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = dict()
+        self.exclusive: Dict[str, float] = dict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def stack(self) -> List[float]:
+        """
+        The seconds spent in nested spans, per active span of the current thread.
+        """
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = list()
+        return stack
+
+    def start(self) -> None:
+        self.stack.append(0.0)
+
+    def stop(self, name: str, seconds: float) -> None:
+        stack = self.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += seconds
+        self.observe(name, seconds, seconds - nested)
+
+    def observe(self, name: str, seconds: float, exclusive: Optional[float] = None) -> None:
+        """
+        Records the duration of a span.
+
+        :param name: the name of the span
+        :param seconds: the duration
+        :param exclusive: the part of the duration not spent in nested spans, by default all
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+            self.exclusive[name] = self.exclusive.get(name, 0.0) + \
+                (seconds if exclusive is None else exclusive)
+
+    def take_exclusive(self) -> Dict[str, float]:
+        """
+        :return: the exclusive seconds of each span since the previous call
+        """
+        with self.lock:
+            exclusive, self.exclusive = self.exclusive, dict()
+        return exclusive
+
+    def prometheus(self) -> str:
+        """
+        :return: the histograms in the Prometheus text format
+        """
+        lines = [f'# HELP {METRIC_NAME} The duration of the steps of dialog turns.',
+                 f'# TYPE {METRIC_NAME} histogram']
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                bounds = [str(bound) for bound in histogram.bounds] + ['+Inf']
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    lines.append(f'{METRIC_NAME}_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'{METRIC_NAME}_sum{{span="{name}"}} {histogram.sum}')
+                lines.append(f'{METRIC_NAME}_count{{span="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def json_lines(self) -> str:
+        """
+        :return: one json object per span with its histogram and the current time
+        """
+        timestamp = time()
+        with self.lock:
+            return ''.join(json.dumps({'time': timestamp, 'span': name,
+                                       'count': histogram.count, 'sum_s': histogram.sum,
+                                       'bounds': list(histogram.bounds),
+                                       'buckets': histogram.counts}) + '\n'
+                           for name, histogram in sorted(self.histograms.items()))
+
+    def write(self, path: Path, metrics_format: str = 'prometheus') -> None:
+        """
+        Writes the histograms to a file. A Prometheus file is replaced at once, so that a
+        collector never reads it half written. JSON lines are appended, so that the file keeps
+        a history of the histograms.
+
+        :param path: the file to write
+        :param metrics_format: prometheus or jsonl
+        """
+        if metrics_format == 'prometheus':
+            temporary = path.with_name(f'.{path.name}')
+            with open(temporary, 'w') as file:
+                file.write(self.prometheus())
+            os.replace(temporary, path)
+        elif metrics_format == 'jsonl':
+            with open(path, 'a') as file:
+                file.write(self.json_lines())
+        else:
+            raise Exception(f'The given metrics format, {metrics_format}, is unknown.')
+
+
+_recorder: Optional[Recorder] = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'recorder', 'start_time')
+
+    def __init__(self, name: str, recorder: Recorder):
+        self.name = name
+        self.recorder = recorder
+
+    def __enter__(self):
+        self.recorder.start()
+        self.start_time = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.stop(self.name, perf_counter() - self.start_time)
+        return False
+
+
+def enable(recorder: Optional[Recorder] = None) -> Recorder:
+    """
+    Starts recording spans.
+
+    :param recorder: the recorder to add the spans to, by default a new one
+    :return: the active recorder
+    """
+    global _recorder
+    _recorder = recorder if recorder is not None else Recorder()
+    return _recorder
+
+
+def disable() -> Optional[Recorder]:
+    """
+    Stops recording spans.
+
+    :return: the recorder that was active, if any
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def active() -> Optional[Recorder]:
+    return _recorder
+
+
+def span(name: str):
+    """
+    Context manager that records the time spent inside it as the given span.
+    """
+    recorder = _recorder
+    return _null_span if recorder is None else _Span(name, recorder)
+
+
+def observe(name: str, seconds: float) -> None:
+    """
+    Records a duration that was measured elsewhere, like the time an utterance waited for its
+    batch to be classified. It is not nested in or around other spans.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.observe(name, seconds)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator that records every call of the function as the given span.
+    """
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return function(*args, **kwargs)
+            recorder.start()
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.stop(name, perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class SessionProfiler:
+    """
+    Profiles the turns of a single session with cProfile. It is entered around every turn, so
+    that the time between turns, and the turns of other sessions, are not part of the profile.
+
+    :var int depth: the number of times the profiler is currently entered
+    """
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.depth = 0
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.profile.enable()
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            self.profile.disable()
+        return False
+
+    def dump(self, path: Path) -> None:
+        """
+        Writes the profile in the format read by pstats and snakeviz.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(str(path))
+
@@ -0,0 +1,97 @@
+from itertools import product
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy
+
+from restaurant_assistant.order_reasoning.info_type import InfoType
+
+
+PREFERENCE_TYPES = (InfoType.food, InfoType.pricerange, InfoType.area)
+
+alternative_sets = {InfoType.pricerange: ['cheap,moderate', 'moderate,expensive'],
+                    InfoType.area: ['centre,north,east', 'centre,north,west', 'centre,south,west',
+                                    'centre,south,east'],
+                    InfoType.food: [
+                        'thai,chinese,korean,vietnamese,asian oriental',
+                        'mediterranean,spanish,portuguese,italian,romanian,tuscan,catalan',
+                        'french,european,bistro,swiss,gastropub,traditional',
+                        'north american,steakhouse,british',
+                        'lebanese,turkish,persian',
+                        'international,modern european,fusion']}
+
+Preference = Tuple[Optional[str], ...]
+
+
+class AlternativesGraph:
+    """
+    The restaurants matching every combination of preferences, and the preferences that can
+    replace each other, computed once when the catalog is loaded. A preference of None matches
+    every restaurant, including those without a value. The alternatives of an order are the
+    orders with a single preference replaced by one of its neighbors, which are all values
+    that share an alternative set with it.
+
+    :var Tuple[InfoType, ...] columns: the info types of the preferences, in the order of the
+        keys
+    :var Dict[InfoType, Dict[str, Tuple[str, ...]]] neighbors: maps info type and value to
+        the values that can replace it
+    :var Dict[Tuple[Optional[str], ...], numpy.ndarray] rows: maps a combination of
+        preferences to the rows that match it, in the order of the catalog. Combinations
+        without rows are left out
+    """
+
+    def __init__(self, codes: Mapping[InfoType, numpy.ndarray],
+                 values: Mapping[InfoType, Sequence[str]],
+                 sets: Dict[InfoType, List[str]] = alternative_sets,
+                 columns: Tuple[InfoType, ...] = PREFERENCE_TYPES):
+        """
+        :param codes: maps info type to the code of every row, negative for missing values
+        :param values: maps info type to the value of every code
+        :param sets: maps info type to its alternative sets, each a comma separated string
+        :param columns: the info types of the preferences
+        """
+        self.columns = columns
+        self.neighbors = dict()
+        for column in columns:
+            neighbors = dict()
+            for alternative_set in sets.get(column, list()):
+                members = alternative_set.split(',')
+                for member in members:
+                    neighbors.setdefault(member, dict()).update(
+                        (other, None) for other in members if other != member)
+            self.neighbors[column] = {value: tuple(others)
+                                      for value, others in neighbors.items()}
+
+        rows = dict()
+        row_values = [[values[column][code] if code >= 0 else None for code in codes[column]]
+                      for column in columns]
+        for row, key in enumerate(zip(*row_values)):
+            for combination in product(*([value, None] if value is not None else [None]
+                                         for value in key)):
+                rows.setdefault(combination, list()).append(row)
+        self.rows = {key: numpy.array(matches, dtype=numpy.intp)
+                     for key, matches in rows.items()}
+
+    def key(self, preference: Dict[InfoType, Optional[str]]) -> Preference:
+        return tuple(preference.get(column) for column in self.columns)
+
+    def alternatives(self, preference: Dict[InfoType, Optional[str]]) \
+            -> List[Tuple[Dict[InfoType, Optional[str]], numpy.ndarray]]:
+        """
+        Finds the alternatives of the preferences that match any restaurants, most restaurants
+        first. Alternatives with the same number of restaurants keep the order of the info
+        types and of the alternative sets.
+
+        :param preference: maps info type to the preferred value, or None
+        :return: the alternative preferences with the rows that match them
+        """
+        key = self.key(preference)
+        found = list()
+        for position, column in enumerate(self.columns):
+            if key[position] is None:
+                continue
+            for neighbor in self.neighbors[column].get(key[position], ()):
+                alternative = key[:position] + (neighbor,) + key[position + 1:]
+                matches = self.rows.get(alternative)
+                if matches is not None:
+                    found.append((dict(zip(self.columns, alternative)), matches))
+        found.sort(key=lambda x: -len(x[1]))
+        return found
@@ -0,0 +1,101 @@
+from threading import Lock
+from types import MappingProxyType
+from typing import Optional
+from pandas.core.frame import DataFrame
+
+from restaurant_assistant.data_processing.data_loader import load_restaurant_info, \
+    restaurant_info_path
+from restaurant_assistant.dialog.input_processor import KeywordIndex
+from restaurant_assistant.order_reasoning.info_type import InfoType
+from restaurant_assistant.order_reasoning.catalog_index import CatalogIndex
+from restaurant_assistant.order_reasoning.alternatives import AlternativesGraph
+
+
+VALUE_COLUMNS = [InfoType.food, InfoType.pricerange, InfoType.area, InfoType.diet,
+                 InfoType.food_quality]
+MISSING_CODE = -1
+UNKNOWN_CODE = -2
+
+
+class Catalog:
+    """
+    The restaurant data together with everything that is derived from it. A catalog is created
+    once per version of the data file and shared by all orders, so it must be treated as read
+    only.
+
+    Every column is stored as integer codes into a dictionary of the values of that column, so
+    that orders can refer to restaurants by their row and compare values as integers. Strings
+    are only looked up when a restaurant is rendered.
+
+    :var int size: the number of restaurants
+    :var Mapping[InfoType, numpy.ndarray] codes: maps info type to the code of the value of
+        every row, or MISSING_CODE for rows without a value
+    :var Mapping[InfoType, Tuple[str]] values: maps info type to the sorted values of its
+        column, where the position of a value is its code
+    :var Mapping[InfoType, Tuple[str]] value_options: maps info type to the values that occur
+        in its column in the data
+    :var Mapping[InfoType, KeywordIndex] value_indices: maps info type to the index over its
+        value options, used to find the values in utterances
+    :var CatalogIndex index: the index over the rows of the data per value
+    :var AlternativesGraph alternatives: the rows matching every combination of preferences,
+        used to find alternatives for orders without matches
+    :var Optional[int] modified: modification time in nanoseconds of the loaded file
+    """
+
+    def __init__(self, data: DataFrame, modified: Optional[int] = None):
+        self.size = len(data.index)
+        self.modified = modified
+        codes = dict()
+        values = dict()
+        for column in data.columns:
+            categorical = data[column].astype('category').cat
+            codes[InfoType[column]] = categorical.codes.to_numpy()
+            values[InfoType[column]] = tuple(categorical.categories)
+        self.codes = MappingProxyType(codes)
+        self.values = MappingProxyType(values)
+        self._code_of = {column: {value: code for code, value in enumerate(column_values)}
+                         for column, column_values in values.items()}
+
+        self.value_options = MappingProxyType({column: values[column]
+                                               for column in VALUE_COLUMNS})
+        self.value_indices = MappingProxyType({key: KeywordIndex(values) for key, values
+                                               in self.value_options.items()})
+        self.index = CatalogIndex(self.size, {column: (codes[column], values[column])
+                                              for column in VALUE_COLUMNS})
+        self.alternatives = AlternativesGraph(codes, values)
+
+    def code(self, column: InfoType, value: str) -> int:
+        """
+        :return: the code of the value in the column, or UNKNOWN_CODE if no row has the value
+        """
+        return self._code_of[column].get(value, UNKNOWN_CODE)
+
+    def value(self, column: InfoType, row: int) -> Optional[str]:
+        """
+        :return: the value of the column in the row, or None if the row has no value
+        """
+        code = self.codes[column][row]
+        return None if code == MISSING_CODE else self.values[column][code]
+
+
+_catalog = None
+_catalog_lock = Lock()
+
+
+def get_catalog() -> Catalog:
+    """
+    Returns the catalog shared by the whole process. The data is only loaded again if the file
+    has been modified since it was last loaded, in which case the new catalog replaces the old
+    one. Orders that still use the old catalog are not affected.
+
+    :return: the current catalog
+    """
+    global _catalog
+    modified = restaurant_info_path.stat().st_mtime_ns
+    catalog = _catalog
+    if catalog is None or catalog.modified != modified:
+        with _catalog_lock:
+            if _catalog is None or _catalog.modified != modified:
+                _catalog = Catalog(load_restaurant_info(), modified)
+            catalog = _catalog
+    return catalog
@@ -0,0 +1,55 @@
+from typing import Dict, Optional, Sequence, Tuple
+import numpy
+
+
+class CatalogIndex:
+    """
+    Inverted index over the restaurant data. For every value of the indexed columns it keeps a
+    bitmap marking the rows with that value, so that the rows matching a set of preferences are
+    found by intersecting bitmaps rather than by joining tables.
+
+    :var int size: the number of rows in the data
+    :var Dict[InfoType, Dict[str, numpy.ndarray]] bitmaps: maps column and value to a boolean
+        array that is True for the rows with that value
+    """
+
+    def __init__(self, size: int, columns: Dict[object, Tuple[numpy.ndarray, Sequence[str]]]):
+        """
+        :param size: the number of rows in the data
+        :param columns: maps each indexed column to the code of every row and the value of
+            every code
+        """
+        self.size = size
+        self.bitmaps = dict()
+        for column, (codes, values) in columns.items():
+            self.bitmaps[column] = {value: codes == code for code, value in enumerate(values)}
+
+    def match(self, preferences: Dict) -> numpy.ndarray:
+        """
+        Computes which rows match all preferences. Preferences that are None match all rows.
+
+        :param preferences: maps column to the required value
+        :return: boolean array that is True for the matching rows
+        """
+        mask = numpy.ones(self.size, dtype=bool)
+        for column, value in preferences.items():
+            if value is None:
+                continue
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is None:
+                return numpy.zeros(self.size, dtype=bool)
+            mask &= bitmap
+        return mask
+
+    def lookup(self, preferences: Dict, rows: Optional[numpy.ndarray] = None) -> numpy.ndarray:
+        """
+        Finds the rows that match all preferences.
+
+        :param preferences: maps column to the required value
+        :param rows: if given, only these rows are considered and their order is kept
+        :return: the positions of the matching rows
+        """
+        mask = self.match(preferences)
+        if rows is None:
+            return numpy.flatnonzero(mask)
+        return rows[mask[rows]]
@@ -0,0 +1,13 @@
+from enum import Enum, auto
+
+
+class InfoType(Enum):
+    restaurantname = auto()
+    pricerange = auto()
+    area = auto()
+    food = auto()
+    phone = auto()
+    addr = auto()
+    postcode = auto()
+    food_quality = auto()
+    diet = auto()
@@ -1,25 +1,10 @@
-from enum import Enum, auto
-from typing import List, Tuple, Dict
-from pandas.core.series import Series
-from pandas.core.frame import DataFrame
-from pandas.core.reshape.merge import merge
-from pandas import isna
-from pandas import concat
-
-from restaurant_assistant.data_processing.data_loader import load_restaurant_info
-from restaurant_assistant.dialog.input_processor import find_keywords
-
+from typing import List, Optional, Tuple
+import numpy
 
-class InfoType(Enum):
-    restaurantname = auto()
-    pricerange = auto()
-    area = auto()
-    food = auto()
-    phone = auto()
-    addr = auto()
-    postcode = auto()
-    food_quality = auto()
-    diet = auto()
+from restaurant_assistant.dialog.input_processor import find_keywords
+from restaurant_assistant.instrumentation import timed
+from restaurant_assistant.order_reasoning.info_type import InfoType
+from restaurant_assistant.order_reasoning.catalog import get_catalog
 
 
 info_keywords = {InfoType.pricerange: ['cost', 'price', 'priced', 'range'],
@@ -31,37 +16,30 @@ info_keywords = {InfoType.pricerange: ['cost', 'price', 'priced', 'range'],
                  InfoType.food_quality: ['food', 'quality', 'reviews'],
                  InfoType.diet: ['diet']}
 
-alternative_sets = {InfoType.pricerange: ['cheap,moderate', 'moderate,expensive'],
-                    InfoType.area: ['centre,north,east', 'centre,north,west', 'centre,south,west',
-                                    'centre,south,east'],
-                    InfoType.food: [
-                        'thai,chinese,korean,vietnamese,asian oriental',
-                        'mediterranean,spanish,portuguese,italian,romanian,tuscan,catalan',
-                        'french,european,bistro,swiss,gastropub,traditional',
-                        'north american,steakhouse,british',
-                        'lebanese,turkish,persian',
-                        'international,modern european,fusion']}
-
 
 class Order:
     """
     Class to keep track of the order of the user and the possible recommendations.
 
     :var Dict[InfoType, str] preference: maps info type to the user preference
-    :var DataFrame data: the data of all restaurants. Columns of type InfoType
-    :var Dict[InfoType, List[str]] value_options: maps info type to words that occur in
+    :var Catalog catalog: the shared restaurant catalog this order was created with
+    :var Mapping[InfoType, Tuple[str]] value_options: maps info type to words that occur in
         its column in the data
-    :var DataFrame options: All options given the current preferences
-    :var Series recommendation: the row of the restaurant that is recommended
+    :var CatalogIndex index: the index over the values of the data
+    :var numpy.ndarray option_ids: the rows of the catalog that are options given the current
+        preferences
+    :var int position: the number of options that have already been recommended
+    :var int recommendation: the row of the restaurant that is recommended
     """
 
     def __init__(self, ordercount: int):
         self.preference = {key: None for key in [InfoType.food, InfoType.pricerange, InfoType.area]}
-        self.data = load_restaurant_info()
-        self.data.columns = [InfoType[x] for x in self.data.columns]
-        self.value_options = self.load_value_options()
+        self.catalog = get_catalog()
+        self.value_options = self.catalog.value_options
+        self.index = self.catalog.index
         self.ordercount = ordercount
-        self.options = None
+        self.option_ids = None
+        self.position = 0
         self.recommendation = None
         self.extras = None
 
@@ -74,7 +52,8 @@ class Order:
         """
         self.reset()
         changes = list()
-        new_keywords = find_keywords({key: self.value_options[key] for key in self.preference},
+        new_keywords = find_keywords({key: self.catalog.value_indices[key]
+                                      for key in self.preference},
                                      {key: info_keywords[key] for key in self.preference},
                                      utterance)
         for info_type, keyword in new_keywords:
@@ -93,7 +72,8 @@ class Order:
         """
         self.reset()
         changes = list()
-        new_keywords = find_keywords({key: self.value_options[key] for key in self.preference},
+        new_keywords = find_keywords({key: self.catalog.value_indices[key]
+                                      for key in self.preference},
                                      {key: info_keywords[key] for key in self.preference},
                                      utterance)
         for info_type, _ in new_keywords:
@@ -116,114 +96,114 @@ class Order:
                              if preference is None]
         return empty_preferences
 
-    def get_recommendation(self) -> Series:
+    def get_recommendation(self) -> Optional[int]:
         """
         Returns a recommendation that hasn't been given yet, or the old recommendation if there
         are no other options.
 
-        :return: the recommendation
+        :return: the row of the recommendation
         """
-        if self.options is None:  # Options haven't been computed yet
+        if self.option_ids is None:  # Options haven't been computed yet
             self.compute_options()
-        if not self.options.empty:  # Options were already computed and there is one left
-            self.recommendation = self.options.iloc[0]
-            self.options = self.options[1:]
+        if self.position < len(self.option_ids):  # There is an option that wasn't given yet
+            self.recommendation = int(self.option_ids[self.position])
+            self.position += 1
 
         return self.recommendation
 
     def set_recommendation(self, choice: int):
-        self.recommendation = self.options.iloc[choice]
-        self.options = self.options.drop(self.options.index[choice])
+        self.recommendation = int(self.option_ids[choice])
+        self.option_ids = numpy.delete(self.option_ids, choice)
 
-    def load_value_options(self) -> Dict[InfoType, List[str]]:
+    def get_info(self, info_type: InfoType) -> Optional[str]:
         """
-        Puts all unique words that occur in the data that can be picked by the user,
-        food, area and price range, into a dict mapping the column name to its possible values.
-
-        :return: a dict mapping column name to its possible values
+        :return: the value of the given info type of the recommended restaurant, or None if it
+            is unknown
         """
-        keywords = dict()
-        for category in list(self.preference.keys()) + [InfoType.diet, InfoType.food_quality]:
-            keywords[category] = list(set([x for x in set(self.data[category])
-                                           if len(str(x)) > 0 and not isna(x)]))
-
-        return keywords
+        return self.catalog.value(info_type, self.recommendation)
 
     def reset(self) -> None:
         """
         Sets the recommendation and options to none.
         """
         self.recommendation = None
-        self.options = None
+        self.option_ids = None
+        self.position = 0
+
+    def set_options(self, option_ids: numpy.ndarray) -> None:
+        """
+        Stores the given rows of the catalog as the options, none of which have been
+        recommended.
+
+        :param option_ids: the rows of the catalog
+        """
+        self.option_ids = option_ids
+        self.position = 0
 
     def query_options(self) -> None:
         """
-        Updates the options query given the preferences. Rather than constantly merging
-        with our large database, once we have our initial set of options, we continue to
-        create subsets using our available options.
+        Updates the options query given the preferences. Rather than constantly searching
+        our large database, once we have our initial set of options, we continue to
+        create subsets using the options that have not been recommended yet.
 
         :return: None
         """
-        current_preferences = {k: v for k, v in self.preference.items() if v is not None}
-        self.options = merge(DataFrame(current_preferences, index=[0]), self.options)
+        self.compute_options()
 
+    @timed('compute_options')
     def compute_options(self) -> None:
         """
-        Computes and stores all options for restaurants.
+        Computes and stores all options for restaurants, by intersecting the bitmaps of the
+        preferences in the index.
         """
-        preference_copy = {k: v for k, v in self.preference.items() if v is not None}
-        if self.options is None:
-            self.options = merge(DataFrame(preference_copy, index=[0]), self.data)
+        if self.option_ids is None:
+            self.set_options(self.index.lookup(self.preference))
         else:
-            self.options = merge(DataFrame(preference_copy, index=[0]), self.options)
+            self.set_options(self.index.lookup(self.preference,
+                                               self.option_ids[self.position:]))
 
+    @timed('render')
     def __str__(self):
         return f'a restaurant serving {self.preference[InfoType.food]} food in the ' \
             f'{self.preference[InfoType.area]}, in the price range '\
             f'{self.preference[InfoType.pricerange]}'
 
+    @timed('compute_alternatives')
     def compute_alternatives(self) -> str:
         """
-        Finds a list of available alternatives for the current order
-        :return: a List that contains all possible alternatives
+        Finds the available alternatives for the current order, which replace one of the
+        preferences by a similar value. The alternatives are looked up in the alternatives
+        graph of the catalog, and the ones with the most restaurants are given first.
+
+        :return: the alternatives to present to the user, or None if there are none
         """
-        self.options = DataFrame()
         return_str = "Here are the available options, please indicate which option number " \
             "you desire:\n"
-        alt_preference_list = {key: None for key in [InfoType.food, InfoType.pricerange,
-                                                     InfoType.area]}
-        alt_preference = {key: None for key in [InfoType.food, InfoType.pricerange, InfoType.area]}
-
-        for info_type in self.preference.keys():
-            for alt_string in alternative_sets[info_type]:
-                alt_options = alt_string.split(',')
-                if self.preference[info_type] in alt_options:
-                    alt_options.remove(self.preference[info_type])
-                    alt_preference_list[info_type] = alt_options
-                elif alt_preference_list[info_type] is None:
-                    alt_preference_list[info_type] = [self.preference[info_type]]
-
-        for info_type in alt_preference_list:
-            alt_preference = self.preference.copy()
-            if alt_preference[info_type] is not None:
-                for pref in alt_preference_list[info_type]:
-                    alt_preference[info_type] = pref
-                    df_option = merge(DataFrame(alt_preference, index=[0]), self.data.copy())
-                    self.options = concat([self.options, df_option])
-
-        if self.options.empty:
+        alternatives = self.catalog.alternatives.alternatives(self.preference)
+        self.set_options(numpy.concatenate([rows for _, rows in alternatives]) if alternatives
+                         else numpy.array([], dtype=numpy.intp))
+
+        if len(self.option_ids) == 0:
             return None
         else:
-            max_display = min(self.ordercount, len(self.options.index))
-            for order_index in range(max_display):
-                option = self.options.iloc[order_index]
-                option_string = (f'{order_index}: {self.str_restaurant(option)}\n')
+            for order_index, row in enumerate(self.option_ids[:self.ordercount]):
+                option_string = (f'{order_index}: {self.str_restaurant(row)}\n')
                 return_str += option_string
         return return_str
 
-    @staticmethod
-    def str_restaurant(row: Series):
-        return f'{row[InfoType.restaurantname]} serves '\
-                f'{row[InfoType.food]}, is in the {row[InfoType.area]} '\
-                f'and the prices are {row[InfoType.pricerange]}. Additionally, their food is '\
-                f'{row[InfoType.food_quality]} and with {row[InfoType.diet]} diet options.'
+    @timed('render')
+    def str_restaurant(self, row: int) -> str:
+        """
+        Describes the restaurant in the given row of the catalog. Unknown values are described
+        as unknown.
+
+        :param row: the row of the restaurant
+        :return: the description
+        """
+        info = {info_type: self.catalog.value(info_type, row) or 'unknown'
+                for info_type in [InfoType.restaurantname, InfoType.food, InfoType.area,
+                                  InfoType.pricerange, InfoType.food_quality, InfoType.diet]}
+        return f'{info[InfoType.restaurantname]} serves '\
+                f'{info[InfoType.food]}, is in the {info[InfoType.area]} '\
+                f'and the prices are {info[InfoType.pricerange]}. Additionally, their food is '\
+                f'{info[InfoType.food_quality]} and with {info[InfoType.diet]} diet options.'
@@ -1,12 +1,16 @@
-from typing import Dict, Tuple, List, Union
-from pandas.core.frame import DataFrame
+from typing import Any, Dict, Tuple, List, Optional, Union
+import numpy
 from pandas.core.series import Series
 from pandas import isna
 
 from restaurant_assistant.dialog.input_processor import find_keywords
+from restaurant_assistant.instrumentation import timed
+from restaurant_assistant.order_reasoning.catalog import Catalog
 from restaurant_assistant.order_reasoning.order import Order, InfoType, info_keywords
+from restaurant_assistant.textclass.keyword_matcher import KeywordMatcher
 
 extras = ['romantic', 'children', 'long time', 'busy', 'big portions', 'healthy']
+extras_matcher = KeywordMatcher(extras)
 
 
 class Rule():
@@ -87,6 +91,94 @@ def get_rules() -> List[Rule]:
             rule13, rule14, rule15, rule16]
 
 
+class RuleEngine:
+    """
+    Applies the rules to many restaurants at once. The inferred properties are kept as boolean
+    arrays with one entry per restaurant, and each rule is applied to all restaurants that are
+    still being inferred with column-wise operations. Rules are applied in order until nothing
+    changes, which gives the same result as applying Rule.apply to each restaurant separately.
+
+    :var List[Rule] rules: the rules in the order they are applied
+    :var List[str] properties: all inferred properties that rules depend on or assign
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self.properties = list(dict.fromkeys(
+            [key for rule in rules for key in rule.antecedent if not isinstance(key, InfoType)]
+            + [rule.consequent for rule in rules]))
+
+    def infer(self, catalog: Catalog, rows: numpy.ndarray, requests: List[Tuple[Any, Any]],
+              active: Optional[numpy.ndarray] = None) \
+            -> Tuple[numpy.ndarray, List[Tuple[Rule, numpy.ndarray]]]:
+        """
+        Infers the properties of the given restaurants until a rule decides on one of the
+        requests.
+
+        :param catalog: the catalog of all restaurants
+        :param rows: the rows of the catalog to infer properties for
+        :param requests: list of properties and their values which are requested
+        :param active: which of the rows to infer properties for, all rows if not given
+        :return: per row 1 if it is recommended, -1 if it is not and 0 if no rule decided,
+            and the rules that were applied in order, with the rows they were applied to
+        """
+        size = len(rows)
+        known = {key: numpy.zeros(size, dtype=bool) for key in self.properties}
+        values = {key: numpy.zeros(size, dtype=bool) for key in self.properties}
+        requested = {key: value for key, value in requests if key in known}
+        conditions = [self.data_condition(rule, catalog, rows) for rule in self.rules]
+
+        verdicts = numpy.zeros(size, dtype=numpy.int8)
+        applied = list()
+        active = numpy.ones(size, dtype=bool) if active is None else active.copy()
+        while active.any():
+            changed = numpy.zeros(size, dtype=bool)
+            for rule, condition in zip(self.rules, conditions):
+                matched = active & condition
+                for key, value in rule.antecedent.items():
+                    if not isinstance(key, InfoType):
+                        matched &= known[key] & (values[key] == value)
+                if not matched.any():
+                    continue
+
+                if rule.consequent in requested:
+                    verdicts[matched] = 1 if rule.value == requested[rule.consequent] else -1
+                    applied.append((rule, matched))
+                    active &= ~matched
+                    continue
+
+                new = matched & ~known[rule.consequent]
+                if new.any():
+                    known[rule.consequent] |= new
+                    values[rule.consequent][new] = rule.value
+                    applied.append((rule, new))
+                    changed |= new
+            active &= changed
+
+        return verdicts, applied
+
+    @staticmethod
+    def data_condition(rule: Rule, catalog: Catalog, rows: numpy.ndarray) -> numpy.ndarray:
+        """
+        Computes for which rows the parts of the antecedent on the data hold, by comparing
+        the codes of the values.
+
+        :param rule: the rule to check
+        :param catalog: the catalog of all restaurants
+        :param rows: the rows of the catalog to check
+        :return: boolean array that is True for the rows meeting the conditions
+        """
+        condition = numpy.ones(len(rows), dtype=bool)
+        for key, value in rule.antecedent.items():
+            if isinstance(key, InfoType):
+                condition &= catalog.codes[key][rows] == catalog.code(key, value)
+        return condition
+
+
+rule_engine = RuleEngine(get_rules())
+
+
+@timed('process_extra')
 def process_extra(utterance: str, order: Order) -> List[str]:
     """
     Extracts all additional preferences. Applies the implication rules to all restaurants, and
@@ -99,54 +191,39 @@ def process_extra(utterance: str, order: Order) -> List[str]:
         and  whether they are recommended.
     """
     extra_keys = [InfoType.food_quality, InfoType.diet]
-    extras_values = {key: value for key, value in order.value_options.items() if key in extra_keys}
+    extras_values = {key: order.catalog.value_indices[key] for key in order.value_options
+                     if key in extra_keys}
     help_values = {key: value for key, value in info_keywords.items() if key in extra_keys}
 
     column_values = find_keywords(extras_values, help_values, utterance)
-    column_values.extend((x, True) for x in extras if x in utterance)
-    for extra in extras:
-        order.options[extra] = Series(dtype='bool')
+    column_values.extend((extras[x], True) for x in sorted(extras_matcher.matches(utterance)))
+    catalog = order.catalog
+    options = order.option_ids
+    preferred = numpy.zeros(len(options), dtype=bool)
+    preferred_value = dict()
+    for key, value in column_values:
+        if key in catalog.codes:
+            match = (catalog.codes[key][options] == catalog.code(key, value)) & ~preferred
+            preferred_value.update((i, value) for i in numpy.flatnonzero(match))
+            preferred |= match
+
+    verdicts, applied = rule_engine.infer(catalog, options, column_values, active=~preferred)
+    rest_values = numpy.where(preferred, 1, verdicts)
 
-    rules = get_rules()
-    rest_list = list()
     rec = '{} is {}recommended, based on preference {}.\n'
+    return_strs = list()
+    for i in numpy.argsort(-rest_values, kind='stable')[:order.ordercount]:
+        name = catalog.value(InfoType.restaurantname, options[i])
+        rest_str = f'{i}: {order.str_restaurant(options[i])}\n'
+        if preferred[i]:
+            rest_str += rec.format(name, '', preferred_value[i])
+        elif verdicts[i] != 0:
+            stack = [rule for rule, rows in applied if rows[i]]
+            rest_str += 'Rules applied:\n'
+            for rule in stack:
+                rest_str += f'{str(rule)}\n'
+            verdict = '' if verdicts[i] == 1 else 'not '
+            rest_str += rec.format(name, verdict, stack[-1].consequent)
+        return_strs.append(rest_str)
 
-    for i in order.options.index:
-        rest_str = f'{i}: {order.str_restaurant(order.options.loc[i])}\n'
-        rest_value = 0
-        for key, value in column_values:
-            if key in order.options.columns and order.options.at[i, key] == value:
-                rest_str += rec.format(order.options.at[i, InfoType.restaurantname], '', value)
-                rest_value = 1
-                break
-        else:
-            loop = True
-            stack = list()
-            while(loop):
-                loop = False
-                for rule in rules:
-                    new_value, match = rule.apply(order.options.loc[i], column_values)
-                    if match is not None:
-                        stack.append(rule)
-                        rest_str += 'Rules applied:\n'
-                        for rule in stack:
-                            rest_str += f'{str(rule)}\n'
-
-                        verdict = '' if match else 'not '
-                        rest_value = 1 if match else -1
-                        rest_str += rec.format(order.options.at[i, InfoType.restaurantname],
-                                               verdict, rule.consequent)
-
-                        loop = False
-                        break
-
-                    if new_value:
-                        order.options.at[i, rule.consequent] = rule.value
-                        stack.append(rule)
-                        loop = True
-
-        rest_list.append((rest_str, rest_value))
-
-    rest_list.sort(key=lambda x: x[1], reverse=True)
-    return_strs = [x[0] for index, x in enumerate(rest_list) if index <= order.ordercount - 1]
     return return_strs
@@ -0,0 +1,228 @@
+"""
+Serves many dialog sessions at once from a single process. Clients connect over TCP and send
+one JSON object per line, for example:
+
+    {"session": "abc", "utterance": "i want cheap chinese food"}
+
+and receive one JSON object per line in return:
+
+    {"session": "abc", "response": "...", "finished": false}
+
+A request without a session id, or with an unknown one, starts a new session. A request
+without an utterance only returns the welcome message of the new session. All sessions share
+the classifier and the restaurant catalog, and the utterances of concurrent sessions are
+classified together in small batches.
+
+When the server has a profile directory, a new session can ask to be profiled by adding
+"profile": true to its first request. Its profile is written when the session is closed, to
+a file named after a random id that is returned as "profile" in the response to that request.
+The session id given by the client is never used in a file name.
+"""
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from time import monotonic, perf_counter
+from typing import Any, Dict, Optional
+
+from restaurant_assistant import instrumentation
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.dialog.session import DialogSession
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, UtteranceType
+from restaurant_assistant.textclass.batch_scheduler import MicroBatchScheduler, MAX_BATCH_SIZE, \
+    MAX_DELAY
+
+
+SESSION_TIMEOUT = 600.0
+MAX_SESSIONS = 10000
+METRICS_INTERVAL = 15.0
+
+
+class DialogServer:
+    """
+    Keeps track of all open sessions and answers requests for them. Sessions that have been
+    inactive for longer than the timeout are removed, and when there are too many sessions the
+    least recently active one is removed.
+
+    :var UtteranceClassifier classifier: the initialized classifier shared by all sessions
+    :var MicroBatchScheduler scheduler: classifies the utterances of all sessions in batches
+    :var OrderedDict[str, DialogSession] sessions: the open sessions, least recently active first
+    :var Path profile_dir: the directory to write the profiles of sessions to, or None if
+        sessions cannot be profiled
+    :var Dict[str, Path] profile_paths: maps the id of every profiled session to the file its
+        profile is written to
+    """
+
+    def __init__(self, classifier: UtteranceClassifier, nr_recs: int, restart: bool,
+                 timeout: float = SESSION_TIMEOUT, max_sessions: int = MAX_SESSIONS,
+                 scheduler: MicroBatchScheduler = None, profile_dir: Optional[Path] = None):
+        self.classifier = classifier
+        self.scheduler = scheduler if scheduler is not None else MicroBatchScheduler(classifier)
+        self.nr_recs = nr_recs
+        self.restart = restart
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.profile_dir = profile_dir
+        self.profile_paths = dict()
+
+    async def classify(self, utterance: str) -> UtteranceType:
+        """
+        Classifies the utterance as part of the next batch. The classify span includes the time
+        the utterance waited for its batch.
+        """
+        start = perf_counter()
+        result = await self.scheduler.classify(utterance)
+        instrumentation.observe('classify', perf_counter() - start)
+        return result
+
+    async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Processes a single request.
+
+        :param request: the decoded request
+        :return: the response to encode
+        """
+        session_id = str(request.get('session') or uuid.uuid4().hex)
+        session = self.sessions.get(session_id)
+        utterance = request.get('utterance')
+
+        extra = dict()
+        if session is None:
+            session = self.open_session(session_id)
+            if request.get('profile') and self.profile_dir is not None:
+                session.profiler = instrumentation.SessionProfiler()
+                extra['profile'] = uuid.uuid4().hex
+                self.profile_paths[session_id] = \
+                    self.profile_dir.joinpath(f'{extra["profile"]}.prof')
+            if utterance is None:
+                return {'session': session_id, 'response': session.response, 'finished': False,
+                        **extra}
+        elif utterance is None:
+            return {'session': session_id, 'error': 'No utterance given.'}
+
+        self.sessions.move_to_end(session_id)
+        utterance = str(utterance).lower()
+        response = session.process(utterance, await self.classify(utterance))
+        if session.finished:
+            self.close_session(session_id)
+
+        return {'session': session_id, 'response': response, 'finished': session.finished,
+                **extra}
+
+    def open_session(self, session_id: str) -> DialogSession:
+        while len(self.sessions) >= self.max_sessions:
+            self.close_session(next(iter(self.sessions)))
+        session = DialogSession(self.classifier, self.nr_recs, self.restart)
+        self.sessions[session_id] = session
+        return session
+
+    def evict_expired(self) -> None:
+        """
+        Removes all sessions that have been inactive for longer than the timeout.
+        """
+        deadline = monotonic() - self.timeout
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_active > deadline:
+                break
+            self.close_session(session_id)
+
+    def close_session(self, session_id: str) -> None:
+        """
+        Removes the session, and writes its profile if it was profiled. Does nothing if the
+        session was already removed, for example when it expired while its last utterance was
+        being classified.
+        """
+        session = self.sessions.pop(session_id, None)
+        path = self.profile_paths.pop(session_id, None)
+        if session is not None and path is not None:
+            session.profiler.dump(path)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('The request should be a JSON object.')
+                    response = await self.handle_request(request)
+                except Exception as error:
+                    response = {'error': str(error)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def run_eviction(self) -> None:
+        while True:
+            await asyncio.sleep(self.timeout / 10)
+            self.evict_expired()
+
+    @staticmethod
+    async def run_metrics(path: Path, metrics_format: str) -> None:
+        recorder = instrumentation.active()
+        try:
+            while True:
+                await asyncio.sleep(METRICS_INTERVAL)
+                recorder.write(path, metrics_format)
+        finally:
+            recorder.write(path, metrics_format)
+
+    async def serve(self, host: str, port: int, metrics: Optional[Path] = None,
+                    metrics_format: str = 'prometheus') -> None:
+        """
+        Serves sessions until cancelled.
+
+        :param host: the address to listen on
+        :param port: the port to listen on
+        :param metrics: the file the time spent in each step of the turns is regularly written
+            to, or None
+        :param metrics_format: the format of the metrics file, prometheus or jsonl
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        tasks = [asyncio.ensure_future(self.run_eviction())]
+        if metrics is not None:
+            instrumentation.enable()
+            tasks.append(asyncio.ensure_future(self.run_metrics(metrics, metrics_format)))
+        print(f'Serving dialog sessions on {host}:{port}.')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.scheduler.close()
+
+
+def run_server(classifier: UtteranceClassifier, nr_recs: int, restart: bool, host: str,
+               port: int, timeout: float = SESSION_TIMEOUT, batch_size: int = MAX_BATCH_SIZE,
+               batch_window: float = MAX_DELAY, metrics: Optional[Path] = None,
+               metrics_format: str = 'prometheus', profile_dir: Optional[Path] = None) -> None:
+    """
+    Initializes the classifier and serves dialog sessions until interrupted.
+
+    :param classifier: the classifier to use for text classification
+    :param nr_recs: the maximum amount of recommendations that the system can give
+    :param restart: whether program restarts are allowed
+    :param host: the address to listen on
+    :param port: the port to listen on
+    :param timeout: the seconds after which an inactive session is removed
+    :param batch_size: the largest number of utterances that are classified at once
+    :param batch_window: the longest time in seconds an utterance waits for its batch to start
+    :param metrics: the file to regularly write the time spent in each step of the turns to
+    :param metrics_format: the format of the metrics file, prometheus or jsonl
+    :param profile_dir: the directory to write the profiles of sessions to
+    """
+    train_data, _ = data_loader.load_dataframes()
+    classifier.initialize(train_data)
+    scheduler = MicroBatchScheduler(classifier, batch_size, batch_window)
+    server = DialogServer(classifier, nr_recs, restart, timeout, scheduler=scheduler,
+                          profile_dir=profile_dir)
+    asyncio.run(server.serve(host, port, metrics, metrics_format))
@@ -0,0 +1,3 @@
+"""
+Converts the output of the assistant to audio in the background.
+"""
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from restaurant_assistant.data_processing.data_loader import data_path
+
+
+AUDIO_CACHE_LOCATION = data_path.joinpath('audio_cache')
+CAPACITY = 64 * 2 ** 20
+
+
+class AudioCache:
+    """
+    Keeps synthesized audio on disk, so that a text that was spoken before does not have to be
+    synthesized again. When the files take more than the capacity, the least recently used
+    ones are removed. The time of last use is kept as the modification time of the files, so
+    the order survives restarts.
+
+    :var Path location: the directory containing the audio files
+    :var int capacity: the most bytes the audio files may take
+    :var OrderedDict[str, int] sizes: the size of every file by name, least recently used first
+    :var int size: the bytes taken by all files
+    """
+
+    def __init__(self, location: Path = AUDIO_CACHE_LOCATION, capacity: int = CAPACITY):
+        self.location = Path(location)
+        self.capacity = capacity
+        self.sizes = OrderedDict()
+        self.size = 0
+        if self.location.is_dir():
+            files = [x for x in self.location.iterdir()
+                     if x.is_file() and not x.name.startswith('.')]
+            for file in sorted(files, key=lambda x: x.stat().st_mtime_ns):
+                self.sizes[file.name] = file.stat().st_size
+        self.size = sum(self.sizes.values())
+
+    @staticmethod
+    def key(text: str, backend: str, voice: str, extension: str) -> str:
+        """
+        :return: the file name of the audio of the text spoken by the given backend and voice
+        """
+        digest = hashlib.sha256(f'{backend}\n{voice}\n{text}'.encode()).hexdigest()
+        return f'{digest[:32]}.{extension}'
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Looks up audio and marks it as most recently used.
+
+        :param key: the file name created by key
+        :return: the audio file, or None when it is not cached
+        """
+        if key not in self.sizes:
+            return None
+        path = self.location.joinpath(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self.size -= self.sizes.pop(key)
+            return None
+        self.sizes.move_to_end(key)
+        return path
+
+    def put(self, key: str, audio: bytes) -> Path:
+        """
+        Stores audio, removing the least recently used files when over capacity.
+
+        :param key: the file name created by key
+        :param audio: the content of the audio file
+        :return: the stored file
+        """
+        self.location.mkdir(parents=True, exist_ok=True)
+        path = self.location.joinpath(key)
+        descriptor, temporary = tempfile.mkstemp(prefix='.', dir=self.location)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(audio)
+        os.replace(temporary, path)
+
+        self.size += len(audio) - self.sizes.pop(key, 0)
+        self.sizes[key] = len(audio)
+        while self.size > self.capacity and len(self.sizes) > 1:
+            name, size = self.sizes.popitem(last=False)
+            self.size -= size
+            evicted = self.location.joinpath(name)
+            if evicted.exists():
+                evicted.unlink()
+        return path
@@ -0,0 +1,96 @@
+import contextlib
+import io
+import math
+import struct
+import wave
+from abc import ABC, abstractmethod
+from typing import Dict, Type
+
+from restaurant_assistant import import_budget
+
+
+class TTSBackend(ABC):
+    """
+    Converts text to audio.
+
+    :var str name: the name of the backend
+    :var str extension: the file extension of the created audio
+    """
+    name = 'tts'
+    extension = 'wav'
+
+    @property
+    @abstractmethod
+    def voice(self) -> str:
+        """
+        Describes everything besides the text that changes the audio, such as the language.
+        """
+
+    @abstractmethod
+    def synthesize(self, text: str) -> bytes:
+        """
+        Converts the text to audio.
+
+        :param text: the text to speak
+        :return: the content of an audio file
+        """
+
+
+class GTTSBackend(TTSBackend):
+    """
+    Uses the Google Text-to-Speech service, which needs an internet connection.
+    """
+    name = 'gtts'
+    extension = 'mp3'
+
+    def __init__(self, lang: str = 'en', slow: bool = False):
+        self.lang = lang
+        self.slow = slow
+
+    @property
+    def voice(self):
+        return f'{self.lang}{"-slow" if self.slow else ""}'
+
+    def synthesize(self, text):
+        gtts = import_budget.timed_import('gtts')
+        mp3 = io.BytesIO()
+        gtts.gTTS(text=text, lang=self.lang, slow=self.slow).write_to_fp(mp3)
+        return mp3.getvalue()
+
+
+class LocalBackend(TTSBackend):
+    """
+    Offline stand-in that creates a short tone for every word instead of speech, for testing
+    the speech output without a network connection.
+    """
+    name = 'local'
+    extension = 'wav'
+
+    def __init__(self, sample_rate: int = 16000, word_duration: float = 0.12,
+                 frequency: float = 440.0):
+        self.sample_rate = sample_rate
+        self.word_duration = word_duration
+        self.frequency = frequency
+
+    @property
+    def voice(self):
+        return f'tone-{self.frequency:g}-{self.word_duration:g}'
+
+    def synthesize(self, text):
+        tone = int(self.sample_rate * self.word_duration * 0.75)
+        pause = int(self.sample_rate * self.word_duration) - tone
+        word = struct.pack(f'<{tone}h', *(
+            int(8000 * math.sin(2 * math.pi * self.frequency * x / self.sample_rate))
+            for x in range(tone))) + bytes(2 * pause)
+
+        audio = io.BytesIO()
+        with contextlib.closing(wave.open(audio, 'wb')) as file:
+            file.setnchannels(1)
+            file.setsampwidth(2)
+            file.setframerate(self.sample_rate)
+            file.writeframes(word * max(len(text.split()), 1))
+        return audio.getvalue()
+
+
+BACKENDS: Dict[str, Type[TTSBackend]] = {backend.name: backend
+                                         for backend in (GTTSBackend, LocalBackend)}
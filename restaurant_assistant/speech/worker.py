@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+from restaurant_assistant import import_budget
+from restaurant_assistant.speech.audio_cache import AudioCache
+from restaurant_assistant.speech.backends import TTSBackend
+
+
+QUEUE_SIZE = 8
+
+
+class PygamePlayer:
+    """
+    Plays audio files with pygame. The mixer is initialized once, when the first file is
+    played. The banner pygame prints when it is imported is turned off with its environment
+    variable, as redirecting stdout from the speech thread would also swallow the dialog
+    output printed in the meantime.
+    """
+
+    def __init__(self):
+        self.music = None
+
+    def play(self, path: Path) -> None:
+        """
+        Plays the audio file and waits until it has finished, so that queued phrases do not
+        interrupt each other.
+        """
+        if self.music is None:
+            os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+            pygame = import_budget.timed_import('pygame')
+            pygame.mixer.init()
+            self.music = pygame.mixer.music
+        self.music.load(str(path))
+        self.music.play()
+        while self.music.get_busy():
+            time.sleep(0.05)
+
+
+class SpeechWorker:
+    """
+    Speaks texts on a background thread, so that the dialog never waits for the synthesis or
+    playback of audio. The synthesized audio is cached, so phrases that were spoken before
+    play instantly. The queue of texts is bounded: when it is full the oldest waiting prefetch
+    is dropped, as it is only needed to speed up later phrases. When no prefetches are waiting
+    the oldest text to speak is dropped, as it would only be spoken long after it was shown.
+
+    :var TTSBackend backend: converts the texts to audio
+    :var AudioCache cache: the synthesized audio of earlier texts
+    :var player: plays audio files through a play method, or None to only synthesize them
+    :var int hits: the number of texts that were found in the cache
+    :var int misses: the number of texts that had to be synthesized
+    :var int queue_size: the most texts that can wait, or 0 for no limit
+    :var deque pending: the waiting texts, each with whether it should be played
+    :var int dropped: the number of texts that were dropped because the queue was full
+    """
+
+    def __init__(self, backend: TTSBackend, cache: Optional[AudioCache] = None,
+                 player=PygamePlayer, queue_size: int = QUEUE_SIZE):
+        self.backend = backend
+        self.cache = cache if cache is not None else AudioCache()
+        self.player = player() if isinstance(player, type) else player
+        self.queue_size = queue_size
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.closing = False
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, name='speech', daemon=True)
+        self.thread.start()
+
+    def say(self, text: str) -> None:
+        """
+        Queues the text to be spoken, without waiting.
+        """
+        self.submit(text, True)
+
+    def prefetch(self, texts: Iterable[str]) -> None:
+        """
+        Queues texts to be synthesized into the cache without speaking them, so that they
+        play instantly when they are needed.
+        """
+        for text in texts:
+            self.submit(text, False)
+
+    def submit(self, text: str, play: bool) -> None:
+        with self.condition:
+            if 0 < self.queue_size <= len(self.pending):
+                self.drop()
+            self.pending.append((text, play))
+            self.condition.notify()
+
+    def drop(self) -> None:
+        """
+        Removes the oldest waiting prefetch, or the oldest waiting text to speak if there are no
+        prefetches. Must be called while holding the condition.
+        """
+        for index, (_, play) in enumerate(self.pending):
+            if not play:
+                del self.pending[index]
+                break
+        else:
+            self.pending.popleft()
+        self.dropped += 1
+
+    def audio(self, text: str) -> Path:
+        """
+        Looks up the audio of the text in the cache, and synthesizes and stores it otherwise.
+
+        :return: the audio file
+        """
+        key = self.cache.key(text, self.backend.name, self.backend.voice,
+                             self.backend.extension)
+        path = self.cache.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        return self.cache.put(key, self.backend.synthesize(text))
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if not self.pending:
+                    break
+                text, play = self.pending.popleft()
+            try:
+                path = self.audio(text)
+                if play and self.player is not None:
+                    self.player.play(path)
+            except Exception as error:
+                print(f'Could not speak "{text}": {error}')
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Stops the worker.
+
+        :param wait: whether the queued texts should still be spoken first
+        """
+        with self.condition:
+            if not wait:
+                self.pending.clear()
+            self.closing = True
+            self.condition.notify()
+        self.thread.join()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict
+from pandas.core.frame import DataFrame
+
+from restaurant_assistant.data_processing.data_loader import Column, data_path
+
+
+ARTIFACT_LOCATION = data_path.joinpath('artifacts')
+# Part of every key. Increase it when the way models are trained or stored changes, so that
+# models made the old way are not loaded anymore. Version 2 trains on weighted unique rows.
+FORMAT_VERSION = 2
+
+
+class ArtifactStore:
+    """
+    Stores trained models on disk, each in its own directory named after a hash of everything
+    the model depends on: the training data, the vocabulary and the hyperparameters. A model is
+    therefore only loaded when it was trained on the same input, and otherwise trained again.
+
+    :var Path location: the directory containing all artifacts
+    """
+
+    def __init__(self, location: Path = ARTIFACT_LOCATION):
+        self.location = Path(location)
+
+    @staticmethod
+    def compute_key(name: str, data: DataFrame, vocabulary: Any,
+                    params: Dict[str, Any]) -> str:
+        """
+        Computes the key of a model.
+
+        :param name: the name of the classifier
+        :param data: the training data
+        :param vocabulary: the state of the vectorizer of the model, like its known words
+        :param params: the hyperparameters of the model
+        :return: hexadecimal hash of all inputs
+        """
+        digest = hashlib.sha256()
+        header = {'name': name, 'version': FORMAT_VERSION, 'params': params,
+                  'vocabulary': vocabulary}
+        digest.update(json.dumps(header, sort_keys=True, default=str).encode())
+        for label, utterance in zip(data[Column.label], data[Column.utterance]):
+            digest.update(f'{label} {utterance}\n'.encode())
+        return digest.hexdigest()
+
+    def path(self, name: str, key: str) -> Path:
+        return self.location.joinpath(f'{name}-{key[:20]}')
+
+    def params_path(self, name: str) -> Path:
+        return self.location.joinpath(f'{name}-params.json')
+
+    def load_params(self, name: str) -> Dict[str, Any]:
+        """
+        Reads the hyperparameters chosen by the hyperparameter search.
+
+        :param name: the name of the classifier
+        :return: the chosen hyperparameters, empty when no search was done
+        """
+        path = self.params_path(name)
+        if not path.is_file():
+            return dict()
+        try:
+            with open(path, 'r') as file:
+                return dict(json.load(file)['params'])
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(f'Could not read the hyperparameters in {path}: {error}')
+            return dict()
+
+    def save_params(self, name: str, report: Dict[str, Any]) -> Path:
+        """
+        Writes the result of a hyperparameter search.
+
+        :param name: the name of the classifier
+        :param report: the search results, with the chosen hyperparameters under 'params'
+        :return: the written file
+        """
+        path = self.params_path(name)
+        self.location.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True, default=str)
+        os.replace(temporary, path)
+        return path
+
+    def load(self, name: str, key: str, read: Callable[[Path], None]) -> bool:
+        """
+        Reads the artifact with the given key if it exists.
+
+        :param name: the name of the classifier
+        :param key: the key of the model
+        :param read: function reading the model out of the artifact directory
+        :return: whether the artifact was found and read
+        """
+        path = self.path(name, key)
+        if not path.is_dir():
+            return False
+        try:
+            read(path)
+        except Exception as error:
+            print(f'Could not read the model in {path}: {error}')
+            return False
+        return True
+
+    def save(self, name: str, key: str, write: Callable[[Path], None]) -> Path:
+        """
+        Writes a new artifact. The files are written to a temporary directory first, which is
+        then renamed, so that an artifact is never found in an incomplete state.
+
+        :param name: the name of the classifier
+        :param key: the key of the model
+        :param write: function writing the model into the given directory
+        :return: the directory of the artifact
+        """
+        path = self.path(name, key)
+        self.location.mkdir(parents=True, exist_ok=True)
+        temporary = Path(tempfile.mkdtemp(prefix=f'.{name}-', dir=self.location))
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        except OSError:
+            if not path.is_dir():
+                raise
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+        return path
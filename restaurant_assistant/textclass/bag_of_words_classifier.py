@@ -0,0 +1,180 @@
+from abc import abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy
+from pandas.core.frame import DataFrame
+from scipy.sparse import csr_matrix
+
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, \
+    UtteranceType, types_from_proba
+from restaurant_assistant.textclass.vectorizer import FEATURE_PARAMS, create_vectorizer
+from restaurant_assistant.textclass.artifact_store import ArtifactStore
+from restaurant_assistant.data_processing.data_loader import Column
+
+
+VECTORIZER_FILE = 'vectorizer.json'
+
+
+class BagOfWordsClassifier(UtteranceClassifier):
+    """
+    Base class for classifiers that classify utterances based on the bag-of-words vectors
+    created by a vectorizer. The feature_mode hyperparameter selects the vectorizer: a column
+    per known word by default, or hashed words and word sequences with 'hashing', which also
+    uses the n_features and ngrams hyperparameters. Subclasses only have to train a model,
+    store it, and compute the probabilities of a batch of converted utterances.
+
+    Trained models are kept in an artifact store together with the vocabulary of the vectorizer.
+    The model is loaded from the store when one was trained on the same data with the same
+    hyperparameters, and is otherwise trained and stored. The hyperparameters are the defaults
+    of the classifier, overridden by the ones found by the hyperparameter search and by the
+    given ones.
+
+    :var str name: the name of the classifier, used to name its artifacts
+    :var Dict[str, Any] default_params: the default hyperparameters
+    :var Dict[str, List[Any]] param_space: the values of each hyperparameter that are tried by
+        the hyperparameter search
+    :var Dict[str, Any] params: the hyperparameters of the model
+    :var Vectorizer vectorizer: converts utterances into sparse rows
+    :var ArtifactStore store: the store containing the trained models
+    :var str artifact_key: the key of the current model in the store
+    """
+    name = 'bag_of_words'
+    default_params: Dict[str, Any] = dict()
+    param_space: Dict[str, List[Any]] = dict()
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None,
+                 store: Optional[ArtifactStore] = None):
+        self.store = store if store is not None else ArtifactStore()
+        self.params = self.resolve_params(params, self.store)
+        self.vectorizer = create_vectorizer(self.params)
+        self.artifact_key = None
+
+    @classmethod
+    def resolve_params(cls, params: Optional[Dict[str, Any]] = None,
+                       store: Optional[ArtifactStore] = None) -> Dict[str, Any]:
+        """
+        Combines the hyperparameters of the classifier without creating it, so that tools can
+        find out how it converts utterances.
+
+        :param params: the given hyperparameters
+        :param store: the store containing the hyperparameters found by the search
+        :return: the defaults, overridden by the searched and by the given hyperparameters
+        """
+        store = store if store is not None else ArtifactStore()
+        return dict(cls.default_params, **store.load_params(cls.name), **(params or dict()))
+
+    def initialize(self, data):
+        self.vectorizer.fit(data[Column.utterance])
+        self.artifact_key = self.store.compute_key(self.name, data,
+                                                   self.vectorizer.get_state(), self.params)
+        path = self.store.path(self.name, self.artifact_key)
+
+        if self.store.load(self.name, self.artifact_key, self.read_artifact):
+            print(f'Model loaded from {path}.')
+        else:
+            features, labels, weights = self.featurize_unique(data)
+            self.train(features, labels, weights)
+            self.store.save(self.name, self.artifact_key, self.write_artifact)
+            print(f'Done training. Model saved to {path}.')
+
+    @property
+    def model_params(self) -> Dict[str, Any]:
+        """
+        The hyperparameters of the model itself, without those of the vectorizer.
+        """
+        return {key: value for key, value in self.params.items() if key not in FEATURE_PARAMS}
+
+    @abstractmethod
+    def train(self, features: csr_matrix, labels: numpy.ndarray,
+              weights: Optional[numpy.ndarray] = None) -> None:
+        """
+        Train a new model on the converted training data. A row with weight n should have the
+        same effect on the model as n identical rows.
+
+        :param features: sparse matrix with one converted utterance per row
+        :param labels: the index of the utterance type of each row
+        :param weights: the weight of each row, or None if every row has weight 1
+        """
+
+    @abstractmethod
+    def save_model(self, directory: Path) -> None:
+        """
+        Write the trained model to files in the given directory.
+        """
+
+    @abstractmethod
+    def load_model(self, directory: Path) -> None:
+        """
+        Read the model from the files in the given directory, written by save_model.
+        """
+
+    @abstractmethod
+    def predict_features(self, features: csr_matrix) -> numpy.ndarray:
+        """
+        Compute the probability of every utterance type for the converted utterances.
+
+        :param features: sparse matrix with one converted utterance per row
+        :return: array of shape (number of rows, number of utterance types)
+        """
+
+    def write_artifact(self, directory: Path) -> None:
+        self.vectorizer.save(directory.joinpath(VECTORIZER_FILE))
+        self.save_model(directory)
+
+    def read_artifact(self, directory: Path) -> None:
+        self.vectorizer.load(directory.joinpath(VECTORIZER_FILE))
+        self.load_model(directory)
+
+    def classify(self, utterance):
+        return self.classify_batch([utterance])[0]
+
+    def classify_batch(self, utterances):
+        return types_from_proba(self.classify_batch_proba(utterances))
+
+    def classify_batch_proba(self, utterances: Sequence[str]) -> numpy.ndarray:
+        return self.predict_features(self.vectorizer.transform(utterances))
+
+    def convert_utterance(self, utterance: str) -> csr_matrix:
+        """
+        Converts the utterance into a sparse row corresponding to the vocabulary of the
+        vectorizer, where words that occur in the utterance are marked with 1.
+
+        :param utterance: string to be converted
+        :return: the created row
+        """
+        return self.vectorizer.transform_one(utterance)
+
+    @staticmethod
+    def convert_labels(data: DataFrame) -> numpy.ndarray:
+        """
+        Converts the labels of the data into the index of their utterance type.
+
+        :param data: data containing a label column
+        :return: array with one label index per row
+        """
+        return numpy.array([UtteranceType[x].value - 1 for x in data[Column.label]],
+                           dtype=numpy.uint8)
+
+    def featurize(self, data: DataFrame) -> Tuple[csr_matrix, numpy.ndarray]:
+        """
+        Converts the utterances into a sparse feature matrix using the current vocabulary, and
+        the labels into the index of their utterance type.
+
+        :param data: data containing a label and an utterance column
+        :return: the sparse feature matrix and the label indices
+        """
+        return self.vectorizer.transform(data[Column.utterance]), self.convert_labels(data)
+
+    def featurize_unique(self, data: DataFrame) \
+            -> Tuple[csr_matrix, numpy.ndarray, numpy.ndarray]:
+        """
+        Converts the data like featurize, but with every distinct combination of label and
+        utterance only once. The number of times it occurs in the data becomes its weight.
+
+        :param data: data containing a label and an utterance column
+        :return: the sparse feature matrix, the label indices and the weight of each row
+        """
+        counts = data.groupby([Column.label, Column.utterance], sort=False).size()
+        unique = counts.index.to_frame(index=False)
+        features, labels = self.featurize(unique)
+        return features, labels, counts.to_numpy(dtype=numpy.float32)
@@ -0,0 +1,83 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional, Tuple
+
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, UtteranceType
+
+
+MAX_BATCH_SIZE = 32
+MAX_DELAY = 0.005
+
+
+class MicroBatchScheduler:
+    """
+    Collects the utterances that are classified concurrently and classifies them together with a
+    single call to classify_batch. A batch is started once it holds max_batch_size utterances,
+    or max_delay seconds after its first utterance arrived. Batches run one at a time on a
+    separate thread, so the event loop keeps accepting utterances in the meantime.
+
+    :var UtteranceClassifier classifier: the initialized classifier
+    :var int max_batch_size: the largest number of utterances classified at once
+    :var float max_delay: the longest time in seconds an utterance waits for its batch to start
+    """
+
+    def __init__(self, classifier: UtteranceClassifier, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_delay: float = MAX_DELAY):
+        self.classifier = classifier
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self.pending: List[Tuple[str, asyncio.Future]] = list()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def classify(self, utterance: str) -> UtteranceType:
+        """
+        Classifies the utterance as part of the next batch.
+
+        :param utterance: the utterance to classify
+        :return: the type of the utterance
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((utterance, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """
+        Starts classifying all pending utterances.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, list()
+        if not batch:
+            return
+
+        utterances = [utterance for utterance, _ in batch]
+        task = asyncio.get_running_loop().run_in_executor(
+            self.executor, self.classifier.classify_batch, utterances)
+        task.add_done_callback(partial(self.resolve, batch))
+
+    @staticmethod
+    def resolve(batch: List[Tuple[str, asyncio.Future]], task: asyncio.Future) -> None:
+        """
+        Passes the results of a finished batch on to the waiting callers.
+        """
+        error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+        if error is not None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(batch, task.result()):
+            if not future.done():
+                future.set_result(result)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,149 @@
+import re
+import string
+from collections import OrderedDict
+from typing import List, Sequence
+import numpy
+
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, \
+    UtteranceType
+
+
+CAPACITY = 4096
+POLICIES = ('lru', 'fifo')
+
+# Apostrophes are kept, as they are part of words like "that's".
+_punctuation = re.compile('[' + re.escape(string.punctuation.replace("'", '')) + ']')
+
+
+def normalize(utterance: str) -> str:
+    """
+    Converts the utterance to lowercase, replaces punctuation by spaces and collapses
+    whitespace, so that utterances that only differ in these respects share a cache entry.
+    """
+    return ' '.join(_punctuation.sub(' ', utterance.lower()).split())
+
+
+class CachedClassifier(UtteranceClassifier):
+    """
+    Wraps another classifier and remembers the type of the utterances it classified. Most
+    turns consist of a small set of utterances like 'yes' and 'thank you', which are then never
+    passed to the model again. The cache is cleared when the artifact key of the wrapped
+    classifier changes, so types predicted by an older model are never returned.
+
+    The wrapped classifier always gets the original utterance. By default utterances are only
+    looked up as they are, so the cache never changes a prediction. With normalize_keys the
+    cache is looked up by the normalized utterance, which gives more hits, but then an
+    utterance that only differs from an earlier one in punctuation or case gets the type
+    predicted for the earlier one, which the model may not have predicted for it.
+
+    Attributes that are not defined by the cache are taken from the wrapped classifier.
+
+    :var UtteranceClassifier classifier: the wrapped classifier
+    :var int capacity: the most utterances that are remembered
+    :var str policy: lru removes the least recently used utterance when the cache is full,
+        fifo the one that was classified first
+    :var bool normalize_keys: whether utterances are looked up by their normalized form
+    :var OrderedDict[str, UtteranceType] cache: the remembered types, in eviction order
+    :var int hits: the number of classified utterances that were not passed to the model,
+        because they were in the cache or occurred earlier in the same batch
+    :var int misses: the number of classified utterances that were passed to the model
+    """
+
+    def __init__(self, classifier: UtteranceClassifier, capacity: int = CAPACITY,
+                 policy: str = 'lru', normalize_keys: bool = False):
+        if policy not in POLICIES:
+            raise Exception(f'The given eviction policy, {policy}, is unknown.')
+        self.classifier = classifier
+        self.capacity = capacity
+        self.policy = policy
+        self.normalize_keys = normalize_keys
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.model_key = None
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['classifier'], name)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def check_model(self) -> None:
+        """
+        Clears the cache if the wrapped classifier has loaded or trained another model.
+        Classifiers that can pick up a new model by themselves, like the online classifier,
+        are asked to do so first, as cached utterances never reach them.
+        """
+        refresh = getattr(self.classifier, 'refresh', None)
+        if refresh is not None:
+            refresh()
+        key = getattr(self.classifier, 'artifact_key', None)
+        if key != self.model_key:
+            self.clear()
+            self.model_key = key
+
+    def initialize(self, data):
+        self.classifier.initialize(data)
+        self.check_model()
+
+    def key(self, utterance: str) -> str:
+        return normalize(utterance) if self.normalize_keys else utterance
+
+    def lookup(self, utterance: str):
+        result = self.cache.get(utterance)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if self.policy == 'lru':
+                self.cache.move_to_end(utterance)
+        return result
+
+    def store(self, utterance: str, result: UtteranceType) -> None:
+        if self.capacity <= 0:
+            return
+        self.cache[utterance] = result
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def classify(self, utterance):
+        self.check_model()
+        key = self.key(utterance)
+        result = self.lookup(key)
+        if result is None:
+            result = self.classifier.classify(utterance)
+            self.store(key, result)
+        return result
+
+    def classify_batch(self, utterances: Sequence[str]) -> List[UtteranceType]:
+        """
+        Only passes the distinct utterances that are not in the cache to the wrapped
+        classifier, as a single batch.
+        """
+        self.check_model()
+        keys = [self.key(utterance) for utterance in utterances]
+        results = dict()
+        missing = dict()
+        for key, utterance in zip(keys, utterances):
+            if key in results:
+                self.hits += 1
+                continue
+            results[key] = self.lookup(key)
+            if results[key] is None:
+                missing[key] = utterance
+        if missing:
+            for key, result in zip(missing, self.classifier.classify_batch(list(missing.values()))):
+                results[key] = result
+                self.store(key, result)
+        return [results[key] for key in keys]
+
+    def classify_batch_proba(self, utterances: Sequence[str]) -> numpy.ndarray:
+        """
+        Probabilities are not cached, so these are always computed by the wrapped classifier.
+        """
+        return self.classifier.classify_batch_proba(utterances)
@@ -0,0 +1,359 @@
+"""
+Evaluates classifiers with k-fold cross-validation. The rows of the dialog data are shuffled
+once with a fixed seed and split into k folds, and every fold is used once as test data for a
+model trained on the other folds. The rows are shuffled because the dialog data is ordered,
+so consecutive folds would differ in the kinds of dialogs they contain. The
+bag-of-words features of the data are computed once per feature mode and placed in shared
+memory, so that the folds of all classifiers can be trained in parallel worker processes
+without copying the features to each of them.
+
+Pretrained classifiers, like numpy_network, load a model that was trained on the training
+split, which overlaps every test fold. They are left out by default, and when they are
+selected their scores are marked as not cross-validated. Run it with:
+
+    python -m restaurant_assistant.textclass.cross_validation -k 5 -c decision_tree keyword
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from multiprocessing import shared_memory
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy
+import pandas
+from scipy.sparse import csr_matrix
+
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.data_processing.data_loader import Column
+from restaurant_assistant.textclass.bag_of_words_classifier import BagOfWordsClassifier
+from restaurant_assistant.textclass.registry import classifier_names, classifier_class, \
+    load_classifier, trainable_names, PRETRAINED
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType, score, \
+    types_from_proba
+from restaurant_assistant.textclass.vectorizer import create_vectorizer, feature_params, \
+    FEATURE_MODES
+
+
+FOLDS = 5
+
+# The features and data of a worker process, set once by attach_features.
+_worker: Dict[str, Any] = dict()
+
+
+class SharedArrays:
+    """
+    Copies arrays into shared memory blocks, which worker processes can map by name.
+
+    :var Dict[str, Tuple[str, Tuple[int, ...], str]] specs: the block name, shape and dtype of
+        each array, which is all a worker needs to map it
+    """
+
+    def __init__(self, arrays: Dict[str, numpy.ndarray]):
+        self.blocks = list()
+        self.specs = dict()
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            numpy.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.specs[key] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = list()
+
+
+def attach_features(specs: Dict[str, Tuple[str, Tuple[int, ...], str]],
+                    feature_sets: Dict[str, Tuple[str, Tuple[int, int], Any]],
+                    paths: Optional[Sequence[Path]]) -> None:
+    """
+    Maps the shared arrays in a worker process. The blocks stay mapped for the lifetime of the
+    worker.
+
+    :param specs: the specs of the shared arrays
+    :param feature_sets: the prefix of the arrays, the shape and the vectorizer state of every
+        feature matrix, by feature key
+    :param paths: the corpus files, by default the bundled dialog data
+    """
+    arrays = dict()
+    for key, (name, array_shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        _worker.setdefault('blocks', list()).append(block)
+        arrays[key] = numpy.ndarray(array_shape, dtype=numpy.dtype(dtype), buffer=block.buf)
+
+    _worker['features'] = {
+        key: (csr_matrix((arrays[f'{prefix}.data'], arrays[f'{prefix}.indices'],
+                          arrays[f'{prefix}.indptr']), shape=shape, copy=False), state)
+        for key, (prefix, shape, state) in feature_sets.items()}
+    _worker['labels'] = arrays['labels']
+    _worker['groups'] = arrays['groups']
+    _worker['arrays'] = arrays
+    _worker['paths'] = paths
+
+
+def worker_data() -> Dict[str, Any]:
+    """
+    :return: the data mapped by attach_features in this worker process: the features and
+        vectorizer state by feature key under 'features', and the shared arrays under 'labels',
+        'groups' and 'arrays'
+    """
+    return _worker
+
+
+def is_bag_of_words(name: str) -> bool:
+    """
+    :return: whether the classifier converts utterances with a vectorizer, False if its
+        dependencies are missing
+    """
+    try:
+        return issubclass(classifier_class(name), BagOfWordsClassifier)
+    except ImportError:
+        return False
+
+
+def feature_key(name: str, kwargs: Dict[str, Any]) -> str:
+    """
+    Finds out how the classifier converts utterances from its class, without creating it.
+
+    :return: a key that is the same for classifiers that convert utterances in the same way
+    """
+    if not is_bag_of_words(name):
+        return '{}'
+    params = classifier_class(name).resolve_params(kwargs.get('params'), kwargs.get('store'))
+    return json.dumps(feature_params(params), sort_keys=True)
+
+
+def unique_rows(rows: numpy.ndarray, groups: numpy.ndarray) \
+        -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Keeps every distinct combination of label and utterance among the rows once, like the
+    featurize_unique method of the classifiers, so that models are trained in the same way as
+    when they are initialized.
+
+    :param rows: the training rows
+    :param groups: the id of the combination of label and utterance of every row
+    :return: the first row of every combination, in the order of the rows, and the number of
+        times each combination occurs as its weight
+    """
+    _, first, counts = numpy.unique(groups[rows], return_index=True, return_counts=True)
+    order = numpy.argsort(first)
+    return rows[first[order]], counts[order].astype(numpy.float32)
+
+
+def share_features(utterances: Sequence[str], labels: numpy.ndarray, keys: Iterable[str],
+                   extra: Optional[Dict[str, numpy.ndarray]] = None) \
+        -> Tuple[SharedArrays, Dict[str, Tuple[str, Tuple[int, int], Any]]]:
+    """
+    Converts the utterances once for every feature key, and places the features and labels in
+    shared memory, together with the id of the combination of label and utterance of every row
+    under 'groups'.
+
+    :param utterances: the utterances to convert
+    :param labels: the label index of every utterance
+    :param keys: the feature keys of the classifiers
+    :param extra: other arrays to share, which workers find by name in _worker['arrays']
+    :return: the shared arrays and the feature sets to pass to attach_features
+    """
+    groups, _ = pandas.factorize(pandas.Series(list(zip(labels.tolist(), utterances))))
+    arrays = dict(extra or dict(), labels=labels, groups=groups.astype(numpy.int64))
+    feature_sets = dict()
+    for index, key in enumerate(sorted(set(keys))):
+        vectorizer = create_vectorizer(json.loads(key)).fit(utterances)
+        features = vectorizer.transform(utterances)
+        arrays.update({f'{index}.data': features.data, f'{index}.indices': features.indices,
+                       f'{index}.indptr': features.indptr})
+        feature_sets[key] = (str(index), features.shape, vectorizer.get_state())
+    return SharedArrays(arrays), feature_sets
+
+
+@lru_cache(maxsize=1)
+def worker_dataframe() -> pandas.DataFrame:
+    return data_loader.load_dataframe(_worker['paths'])
+
+
+def run_fold(name: str, kwargs: Dict[str, Any], fold: int, boundaries: Sequence[int],
+             key: str) -> Dict[str, Any]:
+    """
+    Trains a classifier on all folds except one and scores it on the remaining fold. This runs
+    in a worker process.
+
+    :param name: the registered name of the classifier
+    :param kwargs: arguments passed on to the classifier
+    :param fold: the index of the test fold
+    :param boundaries: the first position of every fold in the shuffled order of the rows,
+        followed by the number of rows
+    :param key: the feature key of the classifier
+    :return: the sizes, timings and scores of the fold
+    """
+    start, stop = boundaries[fold], boundaries[fold + 1]
+    order = _worker['arrays']['order']
+    train_rows = numpy.sort(numpy.concatenate([order[:start], order[stop:]]))
+    test_rows = numpy.sort(order[start:stop])
+    result = {'classifier': name, 'fold': fold}
+    try:
+        classifier = load_classifier(name, **kwargs)
+    except ImportError as error:
+        return dict(result, error=f'{type(error).__name__}: {error}')
+
+    if isinstance(classifier, BagOfWordsClassifier):
+        features, state = _worker['features'][key]
+        labels = _worker['labels']
+        classifier.vectorizer.set_state(state)
+        train_start = perf_counter()
+        rows, weights = unique_rows(train_rows, _worker['groups'])
+        classifier.train(features[rows], labels[rows], weights)
+        predict_start = perf_counter()
+        predicted = types_from_proba(classifier.predict_features(features[test_rows]))
+        true = [UtteranceType(label + 1).name for label in labels[test_rows]]
+    else:
+        data = worker_dataframe()
+        train_start = perf_counter()
+        try:
+            classifier.initialize(data.iloc[train_rows])
+        except FileNotFoundError as error:
+            return dict(result, error=f'{type(error).__name__}: {error}')
+        predict_start = perf_counter()
+        predicted = classifier.classify_batch(list(data[Column.utterance].iloc[test_rows]))
+        true = list(data[Column.label].iloc[test_rows])
+    predict_end = perf_counter()
+
+    f1, accuracy = score(true, [x.name for x in predicted])
+    return dict(result, train_size=int(boundaries[-1] - (stop - start)),
+                test_size=int(stop - start), train_s=predict_start - train_start,
+                predict_s=predict_end - predict_start, f1=f1, accuracy=accuracy)
+
+
+def aggregate(folds: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combines the results of the folds of a single classifier.
+    """
+    errors = [fold['error'] for fold in folds if 'error' in fold]
+    if errors:
+        return {'error': errors[0]}
+    summary = dict()
+    for key in ('f1', 'accuracy'):
+        values = numpy.array([fold[key] for fold in folds])
+        summary[key] = float(values.mean())
+        summary[f'{key}_std'] = float(values.std())
+    for key in ('train_s', 'predict_s'):
+        summary[key] = float(sum(fold[key] for fold in folds))
+    return summary
+
+
+def cross_validate(names: Sequence[str], folds: int = FOLDS, workers: Optional[int] = None,
+                   paths: Optional[Sequence[Path]] = None,
+                   kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+                   seed: int = 0) -> Dict[str, Any]:
+    """
+    Cross-validates the given classifiers, running all folds of all classifiers in parallel.
+
+    The vocabulary is taken from all data, so that the features only have to be computed
+    once per feature mode. Words that only occur in the test fold therefore get their own
+    column instead of the unknown column, but as no model has seen them during training this
+    rarely matters.
+
+    :param names: the registered names of the classifiers
+    :param folds: the number of folds
+    :param workers: the number of worker processes, by default the number of cores
+    :param paths: the corpus files, by default the bundled dialog data
+    :param kwargs: arguments passed on to each classifier, by name
+    :param seed: the seed for shuffling the rows before they are split into folds
+    :return: the results per fold and per classifier, and the timings
+    """
+    kwargs = {name: (kwargs or dict()).get(name, dict()) for name in names}
+    keys = {name: feature_key(name, kwargs[name]) for name in names}
+
+    start = perf_counter()
+    data = data_loader.load_dataframe(paths)
+    order = numpy.random.RandomState(seed).permutation(len(data))
+    shared, feature_sets = share_features(list(data[Column.utterance]),
+                                          BagOfWordsClassifier.convert_labels(data),
+                                          keys.values(), {'order': order})
+    featurize_s = perf_counter() - start
+
+    boundaries = numpy.linspace(0, len(data), folds + 1).astype(int).tolist()
+    workers = workers or min(len(names) * folds, os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=attach_features,
+                                 initargs=(shared.specs, feature_sets, paths)) as executor:
+            futures = [executor.submit(run_fold, name, kwargs[name], fold, boundaries,
+                                       keys[name])
+                       for name in names for fold in range(folds)]
+            results = [future.result() for future in futures]
+    finally:
+        shared.close()
+
+    return {
+        'folds': results,
+        'classifiers': {name: dict(aggregate([result for result in results
+                                              if result['classifier'] == name]),
+                                   cross_validated=name not in PRETRAINED)
+                        for name in names},
+        'featurize_s': featurize_s,
+        'total_s': perf_counter() - start,
+        'workers': workers,
+    }
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f'{"":<16}{"fold":>5}{"train s":>9}{"pred s":>9}{"F1":>8}{"acc":>8}')
+    for fold in results['folds']:
+        if 'error' not in fold:
+            print(f'{fold["classifier"]:<16}{fold["fold"]:>5}{fold["train_s"]:>9.3f}'
+                  f'{fold["predict_s"]:>9.3f}{fold["f1"]:>8.4f}{fold["accuracy"]:>8.4f}')
+    print()
+    for name, summary in results['classifiers'].items():
+        if 'error' in summary:
+            print(f'{name:<16}{summary["error"]}')
+        else:
+            note = '' if summary['cross_validated'] else ', pretrained, not cross-validated'
+            print(f'{name:<16}{"all":>5}{summary["train_s"]:>9.3f}{summary["predict_s"]:>9.3f}'
+                  f'{summary["f1"]:>8.4f}{summary["accuracy"]:>8.4f}'
+                  f'  (F1 std {summary["f1_std"]:.4f}, accuracy std '
+                  f'{summary["accuracy_std"]:.4f}{note})')
+    print(f'Featurized in {results["featurize_s"]:.2f} seconds, finished in '
+          f'{results["total_s"]:.2f} seconds with {results["workers"]} workers.')
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Cross-validates the classifiers.')
+    parser.add_argument('-c', '--classifiers', nargs='+', choices=classifier_names(),
+                        default=trainable_names(),
+                        help='the classifiers to evaluate, by default all that can be trained')
+    parser.add_argument('-k', '--folds', type=int, default=FOLDS, help='the number of folds')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='the number of worker processes, by default one per core')
+    parser.add_argument('-d', '--data', type=Path, nargs='+',
+                        help='the corpus files, by default the bundled dialog data')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed for shuffling the rows before splitting them into folds')
+    parser.add_argument('--feature-mode', choices=FEATURE_MODES,
+                        help='how the bag-of-words classifiers convert utterances, by default '
+                        'their saved or default feature mode')
+    parser.add_argument('-o', '--output', type=Path, help='the json file to write results to')
+    parsed = parser.parse_args(args)
+
+    kwargs = dict()
+    if parsed.feature_mode is not None:
+        kwargs = {name: {'params': {'feature_mode': parsed.feature_mode}}
+                  for name in parsed.classifiers if is_bag_of_words(name)}
+    results = cross_validate(parsed.classifiers, parsed.folds, parsed.workers, parsed.data,
+                             kwargs, parsed.seed)
+    print_results(results)
+    if parsed.output is not None:
+        with open(parsed.output, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f'Results written to {parsed.output}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Searches the hyperparameters of the bag-of-words classifiers. Candidates are taken from the
+param_space of the classifier, trained on the training split of the dialog data minus a
+validation part, and scored on the validation part. Every candidate records its accuracy and
+its inference latency, so that a point on the speed and quality frontier can be chosen. The
+chosen hyperparameters are saved next to the model artifacts, where the classifier picks them
+up. Run it with:
+
+    python -m restaurant_assistant.textclass.hyperparameter_search -c decision_tree -s halving
+
+The features are computed once and shared with the worker processes, like in the
+cross-validation.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence
+import numpy
+
+from restaurant_assistant.data_processing import data_loader
+from restaurant_assistant.data_processing.data_loader import Column
+from restaurant_assistant.textclass.artifact_store import ArtifactStore
+from restaurant_assistant.textclass.bag_of_words_classifier import BagOfWordsClassifier
+from restaurant_assistant.textclass.cross_validation import attach_features, share_features, \
+    unique_rows, worker_data
+from restaurant_assistant.textclass.registry import classifier_names, load_classifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType, score, \
+    types_from_proba
+from restaurant_assistant.textclass.vectorizer import feature_params, FEATURE_MODES
+
+
+STRATEGIES = ('grid', 'random', 'halving')
+CANDIDATES = 27
+ETA = 3
+VALIDATION_FRACTION = 0.2
+LATENCY_SAMPLES = 200
+
+
+def grid(space: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    :return: every combination of the values in the parameter space
+    """
+    keys = sorted(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[x] for x in keys))]
+
+
+def sample(space: Dict[str, List[Any]], count: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    :return: the given number of different combinations of the values in the parameter space,
+        picked at random
+    """
+    candidates = grid(space)
+    return random.Random(seed).sample(candidates, min(count, len(candidates)))
+
+
+def evaluate(name: str, params: Dict[str, Any], rows: int, validation_start: int,
+             key: str) -> Dict[str, Any]:
+    """
+    Trains a classifier with the given hyperparameters and scores it on the validation rows.
+    This runs in a worker process.
+
+    The latency is that of the model on a single converted utterance, as converting the
+    utterance takes the same time for every candidate.
+
+    :param name: the registered name of the classifier
+    :param params: the hyperparameters to try
+    :param rows: the number of training rows to use, picked in a fixed random order. Like
+        when the classifier is initialized, repeated rows are trained on once with their count
+        as weight
+    :param validation_start: the first validation row
+    :param key: the feature key of the classifier
+    :return: the hyperparameters, scores and timings
+    """
+    classifier = load_classifier(name, params=json.loads(key))
+    classifier.params = dict(classifier.default_params, **json.loads(key), **params)
+    shared = worker_data()
+    features, state = shared['features'][key]
+    labels = shared['labels']
+    classifier.vectorizer.set_state(state)
+    train_rows, weights = unique_rows(numpy.sort(shared['arrays']['order'][:rows]),
+                                      shared['groups'])
+
+    start = perf_counter()
+    classifier.train(features[train_rows], labels[train_rows], weights)
+    train_s = perf_counter() - start
+
+    validation = features[validation_start:]
+    predicted = types_from_proba(classifier.predict_features(validation))
+    true = [UtteranceType(label + 1).name for label in labels[validation_start:]]
+    f1, accuracy = score(true, [x.name for x in predicted])
+
+    singles = [validation[index:index + 1]
+               for index in range(min(LATENCY_SAMPLES, validation.shape[0]))]
+    latencies = list()
+    for row in singles:
+        start = perf_counter()
+        classifier.predict_features(row)
+        latencies.append(perf_counter() - start)
+
+    return {'params': params, 'rows': rows, 'f1': f1, 'accuracy': accuracy,
+            'train_s': train_s, 'latency_ms': float(numpy.median(latencies) * 1000)}
+
+
+def frontier(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    :return: the results that are more accurate than every faster result, fastest first
+    """
+    best = list()
+    for result in sorted(results, key=lambda x: (x['latency_ms'], -x['accuracy'])):
+        if not best or result['accuracy'] > best[-1]['accuracy']:
+            best.append(result)
+    return best
+
+
+def choose(results: List[Dict[str, Any]], max_latency: Optional[float] = None) \
+        -> Optional[Dict[str, Any]]:
+    """
+    :return: the most accurate result within the latency limit, the fastest one on ties
+    """
+    allowed = [x for x in results if max_latency is None or x['latency_ms'] <= max_latency]
+    if not allowed:
+        return None
+    return max(allowed, key=lambda x: (x['accuracy'], -x['latency_ms']))
+
+
+def search(name: str, strategy: str = 'halving', candidates: int = CANDIDATES,
+           workers: Optional[int] = None, seed: int = 0, max_latency: Optional[float] = None,
+           paths: Optional[Sequence[Path]] = None,
+           feature_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Searches the hyperparameters of a classifier.
+
+    With the grid strategy every combination is tried, with the random strategy the given
+    number of combinations. Successive halving starts with the random combinations on a small
+    part of the training rows, and only keeps the most accurate third of the candidates within
+    the latency limit for every next round, which uses three times as many rows. The number of
+    rounds is chosen so that at least three candidates reach the last round, unless the
+    latency limit removes them. The chosen candidate and the frontier only include candidates
+    trained on all training rows, as the accuracies of models trained on fewer rows are not
+    comparable to them.
+
+    :param name: the registered name of the classifier
+    :param strategy: grid, random or halving
+    :param candidates: the number of combinations for the random and halving strategies
+    :param workers: the number of worker processes, by default one per core
+    :param seed: the seed for picking combinations and training rows
+    :param max_latency: the highest allowed latency in milliseconds of the chosen candidate
+    :param paths: the corpus files, by default the bundled dialog data
+    :param feature_mode: how utterances are converted, by default the saved or default feature
+        mode of the classifier
+    :return: the report of the search, with the chosen hyperparameters under 'params',
+        including those of the features
+    """
+    kwargs = dict()
+    if feature_mode is not None:
+        kwargs['params'] = {'feature_mode': feature_mode}
+    classifier = load_classifier(name, **kwargs)
+    if not isinstance(classifier, BagOfWordsClassifier) or not classifier.param_space:
+        raise Exception(f'The {name} classifier has no hyperparameters to search.')
+    if strategy == 'grid':
+        pending = grid(classifier.param_space)
+    elif strategy in STRATEGIES:
+        pending = sample(classifier.param_space, candidates, seed)
+    else:
+        raise Exception(f'The given strategy, {strategy}, is unknown.')
+
+    start = perf_counter()
+    train_data, _ = data_loader.load_dataframes(paths)
+    validation_start = int((1 - VALIDATION_FRACTION) * len(train_data))
+    order = numpy.random.RandomState(seed).permutation(validation_start)
+
+    rounds = 1
+    if strategy == 'halving':
+        while len(pending) >= ETA ** (rounds + 1):
+            rounds += 1
+    workers = workers or min(len(pending), os.cpu_count() or 1)
+
+    results = list()
+    key = json.dumps(feature_params(classifier.params), sort_keys=True)
+    shared, feature_sets = share_features(list(train_data[Column.utterance]),
+                                          BagOfWordsClassifier.convert_labels(train_data),
+                                          [key], {'order': order})
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=attach_features,
+                                 initargs=(shared.specs, feature_sets, paths)) as executor:
+            for index in range(rounds):
+                rows = max(validation_start // ETA ** (rounds - 1 - index), 1)
+                print(f'Round {index + 1} of {rounds}: {len(pending)} candidates on {rows} '
+                      'rows.')
+                scored = list(executor.map(evaluate, [name] * len(pending), pending,
+                                           [rows] * len(pending),
+                                           [validation_start] * len(pending),
+                                           [key] * len(pending)))
+                results.extend(dict(result, round=index) for result in scored)
+                allowed = [x for x in scored
+                           if max_latency is None or x['latency_ms'] <= max_latency]
+                allowed.sort(key=lambda x: (-x['accuracy'], x['latency_ms']))
+                pending = [x['params'] for x in allowed[:max(len(scored) // ETA, 1)]]
+                if not pending:
+                    break
+    finally:
+        shared.close()
+
+    final = [x for x in results if x['rows'] == validation_start]
+    chosen = choose(final, max_latency)
+    if chosen is None:
+        raise Exception(f'No candidate is faster than {max_latency} milliseconds.')
+    return {
+        'classifier': name,
+        'strategy': strategy,
+        'params': dict(json.loads(key), **chosen['params']),
+        'accuracy': chosen['accuracy'],
+        'f1': chosen['f1'],
+        'latency_ms': chosen['latency_ms'],
+        'max_latency_ms': max_latency,
+        'train_rows': validation_start,
+        'validation_rows': len(train_data) - validation_start,
+        'frontier': frontier(final),
+        'results': results,
+        'total_s': perf_counter() - start,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f'{"accuracy":>9}{"F1":>8}{"ms":>8}  frontier hyperparameters')
+    for result in report['frontier']:
+        print(f'{result["accuracy"]:>9.4f}{result["f1"]:>8.4f}{result["latency_ms"]:>8.3f}  '
+              f'{result["params"]}')
+    print(f'Chose {report["params"]} with accuracy {report["accuracy"]:.4f} and latency '
+          f'{report["latency_ms"]:.3f} ms, after {len(report["results"])} trainings in '
+          f'{report["total_s"]:.1f} seconds.')
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Searches the hyperparameters of a '
+                                                 'classifier.')
+    parser.add_argument('-c', '--classifier', choices=classifier_names(),
+                        default='decision_tree', help='the classifier to tune')
+    parser.add_argument('-s', '--strategy', choices=STRATEGIES, default='halving',
+                        help='how candidates are picked')
+    parser.add_argument('-n', '--candidates', type=int, default=CANDIDATES,
+                        help='the number of candidates for the random and halving strategies')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='the number of worker processes, by default one per core')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed for picking candidates and training rows')
+    parser.add_argument('--max-latency', type=float,
+                        help='the highest allowed latency in milliseconds')
+    parser.add_argument('--feature-mode', choices=FEATURE_MODES,
+                        help='how utterances are converted, by default the saved or default '
+                        'feature mode of the classifier')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='do not save the chosen hyperparameters')
+    parsed = parser.parse_args(args)
+
+    report = search(parsed.classifier, parsed.strategy, parsed.candidates, parsed.workers,
+                    parsed.seed, parsed.max_latency, feature_mode=parsed.feature_mode)
+    print_report(report)
+    if not parsed.dry_run:
+        path = ArtifactStore().save_params(parsed.classifier, report)
+        print(f'Hyperparameters saved to {path}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
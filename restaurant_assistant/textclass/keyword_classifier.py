@@ -1,27 +1,48 @@
+from typing import Optional
 from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier,\
     UtteranceType
+from restaurant_assistant.textclass.keyword_matcher import KeywordMatcher
 
 
 class KeywordClassifier(UtteranceClassifier):
 
     def __init__(self):
         self.keywords = dict()
+        self.types = list()
+        self.matcher = None
 
     def initialize(self, data):
         self.generate_full_dict()
 
     def classify(self, utterance):
         """
-        search the string with all dictionary words,
+        search the string with all dictionary words in a single pass. If several keywords
+        occur, the keyword that comes last in the dictionary decides the type.
         Todo: count how many of each type appear, the one with the highest occurance is the class
         of that sentence. Otherwise we use the first one we identified.
         """
-        value = UtteranceType.null
-        for key in self.keywords:
-            if key in utterance:
-                value = self.keywords.get(key, UtteranceType.null)
+        value = self.match(utterance)
+        return value if value is not None else UtteranceType.null
 
-        return value
+    def match(self, utterance: str) -> Optional[UtteranceType]:
+        """
+        Finds the type of the utterance based on its keywords only. As this takes a single pass
+        over the characters of the utterance, it can be used as a fast pre-filter before a more
+        expensive classifier.
+
+        :param utterance: the utterance to classify
+        :return: the type of the keyword with the highest precedence, or None if no keyword
+            occurs in the utterance
+        """
+        index = self.matcher.best_match(utterance)
+        return self.types[index] if index is not None else None
+
+    def classify_batch(self, utterances):
+        """
+        Classifies every distinct utterance only once.
+        """
+        types = {utterance: self.classify(utterance) for utterance in set(utterances)}
+        return [types[utterance] for utterance in utterances]
 
     def generate_full_dict(self):
         """
@@ -70,3 +91,6 @@ class KeywordClassifier(UtteranceClassifier):
         for key, wordlist in type_dict.items():
             for word in wordlist:
                 self.keywords[word] = key
+
+        self.types = list(self.keywords.values())
+        self.matcher = KeywordMatcher(list(self.keywords))
@@ -0,0 +1,107 @@
+from collections import deque
+from typing import List, Optional, Sequence, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton that finds all occurrences of a fixed list of keywords in a single
+    pass over a text. Keywords are identified by their position in the list, and when several
+    keywords occur in the same text the one furthest down the list takes precedence.
+
+    :var List[str] keywords: the keywords that are searched for
+    :var List[Dict[str, int]] transitions: the trie, maps a character to the next state
+    :var List[int] fail: the state to continue from when no transition matches
+    :var List[List[int]] outputs: the keywords that end in each state, including those
+        reached through the fail links
+    :var List[int] best: the keyword with the highest precedence ending in each state, or -1
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords = list(keywords)
+        self.transitions = [dict()]
+        self.fail = [0]
+        self.outputs = [list()]
+        self.best = [-1]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in self.transitions[state]:
+                    self.transitions.append(dict())
+                    self.fail.append(0)
+                    self.outputs.append(list())
+                    self.best.append(-1)
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.outputs[state].append(index)
+
+        self.build_fail_links()
+
+    def build_fail_links(self) -> None:
+        """
+        Computes the fail links in breadth-first order, so the outputs of the fail state are
+        complete before they are merged into the outputs of a state.
+        """
+        queue = deque(self.transitions[0].values())
+        for state in queue:
+            self.best[state] = max(self.outputs[state], default=-1)
+        while queue:
+            state = queue.popleft()
+            for char, child in self.transitions[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.transitions[fallback].get(char, 0)
+                self.outputs[child].extend(self.outputs[self.fail[child]])
+                self.best[child] = max(self.outputs[child], default=-1)
+                queue.append(child)
+
+    def step(self, state: int, char: str) -> int:
+        """
+        Moves the automaton one character forward.
+
+        :param state: the current state
+        :param char: the next character of the text
+        :return: the new state
+        """
+        while state and char not in self.transitions[state]:
+            state = self.fail[state]
+        return self.transitions[state].get(char, 0)
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Finds all occurrences of the keywords in the text.
+
+        :param text: the text to search
+        :return: tuples (end position, keyword index) in order of their end position
+        """
+        found = list()
+        state = 0
+        for position, char in enumerate(text):
+            state = self.step(state, char)
+            found.extend((position + 1, index) for index in self.outputs[state])
+        return found
+
+    def matches(self, text: str) -> Set[int]:
+        """
+        Finds which keywords occur in the text.
+
+        :param text: the text to search
+        :return: the indices of all keywords that occur at least once
+        """
+        return set(index for _, index in self.find_all(text))
+
+    def best_match(self, text: str) -> Optional[int]:
+        """
+        Finds the keyword with the highest precedence that occurs in the text.
+
+        :param text: the text to search
+        :return: the index of the keyword, or None if no keyword occurs
+        """
+        best = -1
+        state = 0
+        for char in text:
+            state = self.step(state, char)
+            if self.best[state] > best:
+                best = self.best[state]
+        return best if best >= 0 else None
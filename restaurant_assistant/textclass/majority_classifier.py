@@ -1,5 +1,5 @@
 from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier,\
-    UtteranceType
+    UtteranceType, one_hot
 from restaurant_assistant.data_processing.data_loader import Column
 
 
@@ -14,3 +14,9 @@ class MajorityClassifier(UtteranceClassifier):
 
     def classify(self, utterance):
         return self.answer
+
+    def classify_batch(self, utterances):
+        return [self.answer] * len(utterances)
+
+    def classify_batch_proba(self, utterances):
+        return one_hot([self.answer.value - 1] * len(utterances))
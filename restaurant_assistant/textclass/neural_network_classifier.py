@@ -1,114 +1,161 @@
+import math
 import numpy
 from pathlib import Path
-from typing import List
-from pandas.core.frame import DataFrame
-from sklearn.utils import compute_class_weight
+from typing import Optional
+from scipy.sparse import csr_matrix
 from tensorflow import config
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense
 from tensorflow.keras.initializers import TruncatedNormal
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.utils import Sequence
 
-from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, UtteranceType
-from restaurant_assistant.data_processing.data_loader import Column
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType
+from restaurant_assistant.textclass.bag_of_words_classifier import BagOfWordsClassifier
+from restaurant_assistant.textclass.numpy_network_classifier import save_network, \
+    EXPORT_LOCATION
 
 config.set_visible_devices([], 'GPU')
-CONVERTED = 'converted'
-NR_LABEL = 'nr_label'
-WEIGHTS_LOCATION = Path(__file__).parent.parent.parent.joinpath('data', 'network_weights.h5')
-
-
-class NeuralNetworkClassifier(UtteranceClassifier):
-
-    def __init__(self):
+WEIGHTS_FILE = 'network_weights.h5'
+PREDICT_CHUNK_SIZE = 1024
+
+
+def balanced_class_weights(labels: numpy.ndarray, weights: numpy.ndarray) -> numpy.ndarray:
+    """
+    Computes class weights that are inversely proportional to the total weight of each class,
+    like the balanced class weights of sklearn, but counting weighted rows.
+
+    :param labels: the index of the utterance type of each row
+    :param weights: the weight of each row
+    :return: the weight of each utterance type, 0 for types that do not occur
+    """
+    totals = numpy.bincount(labels, weights=weights, minlength=len(UtteranceType))
+    present = totals > 0
+    class_weights = numpy.zeros(len(UtteranceType))
+    class_weights[present] = totals.sum() / (present.sum() * totals[present])
+    return class_weights
+
+
+class SparseBatchSequence(Sequence):
+    """
+    Feeds a sparse feature matrix to the network, only converting a single batch at a time
+    into a dense array. The rows are shuffled after every epoch if shuffle is set. When weights
+    are given, every batch also contains the weight of each row.
+    """
+
+    def __init__(self, features: csr_matrix, labels: numpy.ndarray, batch_size: int,
+                 shuffle: bool = True, weights: Optional[numpy.ndarray] = None):
+        self.features = features
+        self.labels = labels
+        self.weights = weights
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.order = numpy.arange(features.shape[0])
+        self.on_epoch_end()
+
+    def __len__(self):
+        return math.ceil(self.features.shape[0] / self.batch_size)
+
+    def __getitem__(self, index):
+        rows = self.order[index * self.batch_size:(index + 1) * self.batch_size]
+        batch = self.features[rows].toarray().astype(numpy.float32), self.labels[rows]
+        return batch if self.weights is None else batch + (self.weights[rows],)
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            numpy.random.shuffle(self.order)
+
+
+class NeuralNetworkClassifier(BagOfWordsClassifier):
+    name = 'neural_network'
+    default_params = {'hidden_units': 128, 'learning_rate': 0.001, 'epochs': 10,
+                      'batch_size': 32, 'validation_split': 0.1}
+    param_space = {'hidden_units': [32, 64, 128, 256], 'learning_rate': [0.0003, 0.001, 0.003],
+                   'epochs': [5, 10, 20], 'batch_size': [32, 64, 128]}
+
+    def __init__(self, params=None, store=None):
+        super().__init__(params, store)
         self.network = None
-        self.words = list()
-
-    def initialize(self, data: DataFrame):
-        self.process_data(data)
-        self.network = self.build_model(len(self.words))
-        class_weights = compute_class_weight(class_weight='balanced',
-                                             classes=[x.name for x in UtteranceType],
-                                             y=data[Column.label])
-        class_weights = {num: value for num, value in enumerate(class_weights)}
-
-        print('Do you want to load a model from a previous run? Enter y/n')
-        answer = input().lower()
-
-        if answer == 'y':
-            self.network.load_weights(WEIGHTS_LOCATION)
-            print('Model loaded.')
-        else:
-            history = self.network.fit(
-                x=numpy.array(data[CONVERTED].to_list()),
-                y=numpy.array(data[NR_LABEL].to_list()),
-                epochs=10,
-                verbose=2,
-                validation_split=0.1,
-                batch_size=32,
-                class_weight=class_weights)
-
-            print('Done training. Do you want to save the model? y/n')
-            answer = input().lower()
-            if answer == 'y':
-                self.network.save_weights(WEIGHTS_LOCATION)
-                print(f'Network weights saved to {WEIGHTS_LOCATION}.')
-
-    def classify(self, utterance):
-        converted = self.convert_utterance(utterance)
-        output = list(self.network.predict([converted])[0])
-        max_index = output.index(max(output))
-        return UtteranceType(max_index + 1)
-
-    def convert_utterance(self, utterance: str) -> List[int]:
-        """
-        Converts the utterance into a list corresponding to self.words, where words that occur
-        in the utterance are marked with 1, and the rest as 0.
 
-        :param utterance: string to be converted
-        :return: the created list
+    def train(self, features, labels, weights=None):
         """
-        converted = [0 for _ in self.words]
-        for word in utterance.lower().split():
-            try:
-                index = self.words.index(word)
-            except Exception:  # word not in known list of words
-                index = 0
-            converted[index] = 1
-        return converted
-
-    def process_data(self, data: DataFrame) -> None:
+        The weight of every row is multiplied by the balanced weight of its class, so that every
+        utterance type has the same influence on the loss. The weights are then scaled to an
+        average of 1, so that the learning rate keeps the same meaning when rows are weighted.
+
+        When the rows are unique utterances weighted by how often they occur, an epoch takes
+        fewer steps than an epoch over all utterances. The number of epochs is therefore
+        multiplied by the total weight per row, so that training takes as many steps as it
+        would on the original data.
         """
-        Creates a list of all words in the training data and saves them to self.words.
-        Adds columns to the data for converted utterances and the label in one-hot coding format.
+        self.network = self.build_model(self.vectorizer.size, self.params['hidden_units'],
+                                        self.params['learning_rate'])
+        if weights is None:
+            weights = numpy.ones(len(labels), dtype=numpy.float32)
+        epochs = max(round(self.params['epochs'] * weights.sum() / len(weights)), 1)
+        weights = weights * balanced_class_weights(labels, weights)[labels]
+        weights = (weights * (len(weights) / weights.sum())).astype(numpy.float32)
+
+        batch_size = self.params['batch_size']
+        split = int((1 - self.params['validation_split']) * features.shape[0])
+        self.network.fit(
+            x=SparseBatchSequence(features[:split], labels[:split], batch_size=batch_size,
+                                  weights=weights[:split]),
+            validation_data=SparseBatchSequence(features[split:], labels[split:],
+                                                batch_size=batch_size, shuffle=False,
+                                                weights=weights[split:]),
+            epochs=epochs,
+            verbose=2)
+
+    def save_model(self, directory):
+        self.network.save_weights(str(directory.joinpath(WEIGHTS_FILE)))
+
+    def load_model(self, directory):
+        self.network = self.build_model(self.vectorizer.size, self.params['hidden_units'],
+                                        self.params['learning_rate'])
+        self.network.load_weights(str(directory.joinpath(WEIGHTS_FILE)))
+
+    def export(self, path: Path = EXPORT_LOCATION) -> None:
+        """
+        Exports the weights and input features of the trained network, so that it can be used by
+        the numpy_network classifier without TensorFlow.
 
-        :param data: training data. Not yet separated from validation data
+        :param path: the npz file to write
         """
-        all_words = sorted(list(set([y for x in data[Column.utterance]
-                                     for y in x.lower().split()])))
-        all_words.insert(0, None)
-        self.words = all_words
+        save_network(path, self.network.get_weights(), self.vectorizer)
+        print(f'Network exported to {path}.')
 
-        data[CONVERTED] = [self.convert_utterance(x) for x in data[Column.utterance]]
-        data[NR_LABEL] = [[0 if y != UtteranceType[x] else 1
-                           for y in UtteranceType]
-                          for x in data[Column.label]]
+    def predict_features(self, features):
+        """
+        Runs the network on chunks of the sparse rows, so that only a single chunk is
+        converted to a dense array at a time.
+        """
+        proba = numpy.zeros((features.shape[0], len(UtteranceType)), dtype=numpy.float32)
+        for start in range(0, features.shape[0], PREDICT_CHUNK_SIZE):
+            chunk = features[start:start + PREDICT_CHUNK_SIZE].toarray().astype(numpy.float32)
+            proba[start:start + PREDICT_CHUNK_SIZE] = self.network.predict_on_batch(chunk)
+        return proba
 
     @staticmethod
-    def build_model(input_size: int) -> Sequential:
+    def build_model(input_size: int, hidden_units: int = 128,
+                    learning_rate: float = 0.001) -> Sequential:
         """
         Builds a neural network.
 
         :param input_size: how many words are in the input layer
+        :param hidden_units: how many units are in the hidden layer
+        :param learning_rate: the learning rate of the optimizer
         :return: a compiled neural network
         """
         input_size = [input_size]
         model = Sequential()
-        model.add(Dense(128, activation='relu', input_shape=input_size,
+        model.add(Dense(hidden_units, activation='relu', input_shape=input_size,
                         kernel_initializer=TruncatedNormal(mean=0.0, stddev=0.05, seed=None),
                         bias_initializer='zeros'))
         model.add(Dense(len(UtteranceType), activation='softmax',
                         kernel_initializer=TruncatedNormal(mean=0.0, stddev=0.05, seed=None),
                         bias_initializer='zeros'))
 
-        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        model.compile(optimizer=Adam(learning_rate=learning_rate),
+                      loss='sparse_categorical_crossentropy', metrics=['accuracy'])
         return model
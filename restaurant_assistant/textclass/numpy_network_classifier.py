@@ -0,0 +1,111 @@
+from pathlib import Path
+from typing import List, Sequence
+import numpy
+from scipy.sparse import csr_matrix
+
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier, \
+    UtteranceType, types_from_proba
+from restaurant_assistant.textclass.vectorizer import Vectorizer, BagOfWordsVectorizer, \
+    HashingVectorizer
+from restaurant_assistant.data_processing.data_loader import data_path
+
+
+EXPORT_LOCATION = data_path.joinpath('network.npz')
+
+
+def save_network(path: Path, weights: List[numpy.ndarray], vectorizer: Vectorizer) -> None:
+    """
+    Writes the weights of a trained network with a single hidden layer to a compressed npz
+    file, together with the vocabulary of its input layer, or the size and n-gram length when
+    the input is hashed.
+
+    :param path: the file to write
+    :param weights: the kernel and bias of the hidden layer, followed by those of the output
+        layer
+    :param vectorizer: the vectorizer the network was trained with
+    """
+    hidden_kernel, hidden_bias, output_kernel, output_bias = weights
+    if isinstance(vectorizer, HashingVectorizer):
+        features = {'feature_mode': numpy.array('hashing'),
+                    'n_features': numpy.array(vectorizer.n_features),
+                    'ngrams': numpy.array(vectorizer.ngrams)}
+    else:
+        features = {'words': numpy.array(vectorizer.words[1:], dtype=str)}
+    numpy.savez_compressed(path,
+                           hidden_kernel=numpy.asarray(hidden_kernel, dtype=numpy.float32),
+                           hidden_bias=numpy.asarray(hidden_bias, dtype=numpy.float32),
+                           output_kernel=numpy.asarray(output_kernel, dtype=numpy.float32),
+                           output_bias=numpy.asarray(output_bias, dtype=numpy.float32),
+                           **features)
+
+
+class NumpyNetworkClassifier(UtteranceClassifier):
+    """
+    Inference only version of the neural network classifier, which runs the forward pass of an
+    exported network with NumPy. It does not need TensorFlow, and cannot be trained: the network
+    has to be exported by the neural network classifier first.
+
+    :var Path location: the npz file written by save_network
+    :var Vectorizer vectorizer: converts utterances into sparse rows
+    """
+    name = 'numpy_network'
+
+    def __init__(self, location: Path = EXPORT_LOCATION):
+        self.location = Path(location)
+        self.vectorizer = BagOfWordsVectorizer()
+        self.hidden_kernel = None
+        self.hidden_bias = None
+        self.output_kernel = None
+        self.output_bias = None
+
+    def initialize(self, data):
+        if not self.location.is_file():
+            raise FileNotFoundError(f'No exported network found at {self.location}. Export it '
+                                    'by running the neural_network classifier with --export.')
+        self.load(self.location)
+
+    def load(self, path: Path) -> None:
+        """
+        Reads the weights and the vocabulary or hashing settings written by save_network.
+
+        :param path: the file to read
+        """
+        with numpy.load(path) as network:
+            self.hidden_kernel = network['hidden_kernel']
+            self.hidden_bias = network['hidden_bias']
+            self.output_kernel = network['output_kernel']
+            self.output_bias = network['output_bias']
+            if 'feature_mode' in network and str(network['feature_mode']) == 'hashing':
+                self.vectorizer = HashingVectorizer(int(network['n_features']),
+                                                    int(network['ngrams']))
+            else:
+                self.vectorizer = BagOfWordsVectorizer([None] + network['words'].tolist())
+
+    def classify(self, utterance):
+        """
+        As all inputs are either 0 or 1, the hidden layer of a single utterance is the sum of
+        the kernel rows of its words.
+        """
+        indices = self.vectorizer.indices(utterance)
+        hidden = self.hidden_kernel[indices].sum(axis=0) + self.hidden_bias
+        output = numpy.maximum(hidden, 0) @ self.output_kernel + self.output_bias
+        return UtteranceType(int(numpy.argmax(output)) + 1)
+
+    def classify_batch(self, utterances):
+        return types_from_proba(self.classify_batch_proba(utterances))
+
+    def classify_batch_proba(self, utterances: Sequence[str]) -> numpy.ndarray:
+        return self.predict_features(self.vectorizer.transform(utterances))
+
+    def predict_features(self, features: csr_matrix) -> numpy.ndarray:
+        """
+        Runs the forward pass on the sparse rows.
+
+        :param features: sparse matrix with one converted utterance per row
+        :return: array of shape (number of rows, number of utterance types)
+        """
+        hidden = features.astype(numpy.float32) @ self.hidden_kernel + self.hidden_bias
+        logits = numpy.maximum(hidden, 0) @ self.output_kernel + self.output_bias
+        logits -= logits.max(axis=1, keepdims=True)
+        proba = numpy.exp(logits)
+        return proba / proba.sum(axis=1, keepdims=True)
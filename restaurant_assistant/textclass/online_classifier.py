@@ -0,0 +1,285 @@
+"""
+Classifier that keeps learning after it has been trained. New labelled utterances, like
+corrections collected in production, are folded into the model with partial_fit in a single
+cheap update instead of a full retrain. Run
+
+    python -m restaurant_assistant.textclass.online_classifier corrections.dat
+
+to fold a file with one label and utterance per line, like dialogs.dat, into the saved model.
+A running assistant or server that uses the online classifier notices that the checkpoint was
+replaced, and loads it before it classifies the next utterance, so corrections are picked up
+without a restart.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy
+
+from restaurant_assistant.data_processing.corpus import iter_records
+from restaurant_assistant.data_processing.data_loader import Column, data_path
+from restaurant_assistant.textclass.bag_of_words_classifier import BagOfWordsClassifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType
+from restaurant_assistant.textclass.vectorizer import BagOfWordsVectorizer
+
+
+CHECKPOINT_LOCATION = data_path.joinpath('online_model.npz')
+MODEL_FILE = 'online_model.npz'
+EPSILON = 1e-8
+
+
+class OnlineClassifier(BagOfWordsClassifier):
+    """
+    Softmax regression on the bag-of-words vectors, trained with AdaGrad. Every update only
+    touches the rows of the weights that belong to the words in the batch, so an update takes
+    time in proportion to the batch and not to the vocabulary. Words that were not seen before
+    get a new column and weight row when they are learned, so the vocabulary grows with the
+    data. The model is saved to its checkpoint after training, and during partial_fit every
+    time checkpoint_every new rows have been learned.
+
+    The model in the checkpoint is loaded instead of training on the given data, as it may
+    contain updates that are not part of that data. When another process replaces the
+    checkpoint, it is loaded again before the next classification.
+
+    :var Path checkpoint_path: the checkpoint file
+    :var Tuple[int, int, int] checkpoint_version: the inode, modification time and size of the
+        checkpoint this model last loaded or wrote, or None
+    :var numpy.ndarray weights: the weight of every column for every utterance type
+    :var numpy.ndarray bias: the bias of every utterance type
+    :var numpy.ndarray weights_squared: the sum of the squared gradients of the weights
+    :var numpy.ndarray bias_squared: the sum of the squared gradients of the bias
+    :var int updates: the number of rows learned
+    :var int pending: the number of rows learned since the last checkpoint
+    """
+    name = 'online'
+    default_params = {'learning_rate': 1.0, 'epochs': 10, 'batch_size': 32,
+                      'checkpoint_every': 1000}
+    param_space = {'learning_rate': [0.1, 0.5, 1.0], 'epochs': [5, 10, 20],
+                   'batch_size': [16, 32, 64]}
+
+    def __init__(self, params=None, store=None, location: Path = CHECKPOINT_LOCATION):
+        super().__init__(params, store)
+        self.checkpoint_path = Path(location)
+        self.checkpoint_version = None
+        self.pending = 0
+        self.reset()
+
+    def initialize(self, data):
+        if self.checkpoint_path.is_file():
+            self.load_checkpoint()
+            print(f'Model loaded from {self.checkpoint_path}.')
+        else:
+            self.vectorizer.fit(data[Column.utterance])
+            features, labels, weights = self.featurize_unique(data)
+            self.train(features, labels, weights)
+            self.checkpoint()
+            print(f'Done training. Model saved to {self.checkpoint_path}.')
+        self.update_key()
+
+    def update_key(self) -> None:
+        """
+        Gives the model a new key after every update, which tells wrappers like the cached
+        classifier that earlier results may have changed. The key contains a hash of the model,
+        as two different checkpoints can have learned the same number of rows.
+        """
+        digest = hashlib.sha256(self.weights.tobytes())
+        digest.update(self.bias.tobytes())
+        digest.update(json.dumps(self.vectorizer.get_state(), sort_keys=True).encode())
+        self.artifact_key = f'{self.name}-{self.updates}-{digest.hexdigest()[:20]}'
+
+    def reset(self) -> None:
+        """
+        Starts over with zero weights for the current columns of the vectorizer.
+        """
+        self.weights = numpy.zeros((self.vectorizer.size, len(UtteranceType)),
+                                   dtype=numpy.float32)
+        self.bias = numpy.zeros(len(UtteranceType), dtype=numpy.float32)
+        self.weights_squared = numpy.zeros_like(self.weights)
+        self.bias_squared = numpy.zeros_like(self.bias)
+        self.updates = 0
+
+    def grow(self) -> None:
+        """
+        Adds zero weights for the columns that were added to the vectorizer.
+        """
+        added = self.vectorizer.size - self.weights.shape[0]
+        if added > 0:
+            padding = numpy.zeros((added, len(UtteranceType)), dtype=numpy.float32)
+            self.weights = numpy.concatenate([self.weights, padding])
+            self.weights_squared = numpy.concatenate([self.weights_squared, padding])
+
+    def train(self, features, labels, weights=None):
+        self.reset()
+        for _ in range(self.params['epochs']):
+            self.learn(features, labels, weights)
+
+    def learn(self, features, labels, weights=None) -> None:
+        """
+        Makes a single pass over the rows in a random order, in batches.
+        """
+        if weights is None:
+            weights = numpy.ones(features.shape[0], dtype=numpy.float32)
+        order = numpy.random.permutation(features.shape[0])
+        batch_size = self.params['batch_size']
+        for start in range(0, len(order), batch_size):
+            rows = numpy.sort(order[start:start + batch_size])
+            self.update(features[rows], labels[rows], weights[rows])
+        self.updates += features.shape[0]
+
+    def update(self, features, labels: numpy.ndarray, weights: numpy.ndarray) -> None:
+        """
+        Takes a single AdaGrad step on the weighted cross-entropy of a batch.
+        """
+        columns = numpy.unique(features.indices)
+        batch = features[:, columns].astype(numpy.float32)
+
+        gradient = self.softmax(batch @ self.weights[columns] + self.bias)
+        gradient[numpy.arange(len(labels)), labels] -= 1
+        gradient *= (weights / weights.sum())[:, None]
+        weights_gradient = batch.T @ gradient
+        bias_gradient = gradient.sum(axis=0)
+
+        learning_rate = self.params['learning_rate']
+        self.weights_squared[columns] += weights_gradient ** 2
+        self.weights[columns] -= learning_rate * weights_gradient / \
+            (numpy.sqrt(self.weights_squared[columns]) + EPSILON)
+        self.bias_squared += bias_gradient ** 2
+        self.bias -= learning_rate * bias_gradient / (numpy.sqrt(self.bias_squared) + EPSILON)
+
+    def partial_fit(self, utterances: Sequence[str],
+                    labels: Sequence[Union[UtteranceType, str]],
+                    weights: Optional[Sequence[float]] = None) -> None:
+        """
+        Learns from new labelled utterances with a single pass over them.
+
+        :param utterances: the new utterances
+        :param labels: the utterance type of each utterance, or its name
+        :param weights: the weight of each utterance, by default 1
+        """
+        if isinstance(self.vectorizer, BagOfWordsVectorizer):
+            self.vectorizer.add_words(utterances)
+            self.grow()
+        label_indices = numpy.array([(x if isinstance(x, UtteranceType) else UtteranceType[x])
+                                     .value - 1 for x in labels], dtype=numpy.uint8)
+        if weights is not None:
+            weights = numpy.asarray(weights, dtype=numpy.float32)
+        self.learn(self.vectorizer.transform(utterances), label_indices, weights)
+        self.update_key()
+
+        self.pending += len(label_indices)
+        if self.pending >= self.params['checkpoint_every']:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        self.save(self.checkpoint_path)
+        self.checkpoint_version = self.stat_checkpoint()
+        self.pending = 0
+
+    def stat_checkpoint(self) -> Optional[Tuple[int, int, int]]:
+        """
+        :return: the inode, modification time and size of the checkpoint, or None if there is
+            none. The checkpoint is replaced as a new file, so the inode changes even when it is
+            replaced twice within the resolution of the modification time
+        """
+        try:
+            stat = self.checkpoint_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load_checkpoint(self) -> None:
+        version = self.stat_checkpoint()
+        self.load(self.checkpoint_path)
+        self.checkpoint_version = version
+        self.pending = 0
+
+    def refresh(self) -> None:
+        """
+        Loads the checkpoint again if it was replaced since this model last loaded or wrote it,
+        for example by folding in corrections from the command line. Updates of this model that
+        were not written to a checkpoint yet are lost.
+        """
+        if self.checkpoint_version is None:
+            return
+        version = self.stat_checkpoint()
+        if version is not None and version != self.checkpoint_version:
+            self.load_checkpoint()
+            self.update_key()
+            print(f'Model reloaded from {self.checkpoint_path}.')
+
+    def classify_batch_proba(self, utterances):
+        self.refresh()
+        return super().classify_batch_proba(utterances)
+
+    @staticmethod
+    def softmax(logits: numpy.ndarray) -> numpy.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        proba = numpy.exp(logits)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict_features(self, features):
+        return self.softmax(features.astype(numpy.float32) @ self.weights + self.bias)
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the model, its training state and its vectorizer to a single npz file. The file
+        is replaced at once, so a checkpoint is never left half written.
+
+        :param path: the file to write
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f'.{path.name}')
+        with open(temporary, 'wb') as file:
+            numpy.savez(file, weights=self.weights, bias=self.bias,
+                        weights_squared=self.weights_squared, bias_squared=self.bias_squared,
+                        updates=numpy.array(self.updates),
+                        vectorizer=numpy.array(json.dumps(self.vectorizer.get_state())))
+        os.replace(temporary, path)
+
+    def load(self, path: Path) -> None:
+        """
+        Reads a model written by save.
+
+        :param path: the file to read
+        """
+        with numpy.load(path) as model:
+            self.weights = model['weights']
+            self.bias = model['bias']
+            self.weights_squared = model['weights_squared']
+            self.bias_squared = model['bias_squared']
+            self.updates = int(model['updates'])
+            self.vectorizer.set_state(json.loads(str(model['vectorizer'])))
+
+    def save_model(self, directory):
+        self.save(directory.joinpath(MODEL_FILE))
+
+    def load_model(self, directory):
+        self.load(directory.joinpath(MODEL_FILE))
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Folds labelled utterances into the online '
+                                                 'classifier.')
+    parser.add_argument('files', type=Path, nargs='+',
+                        help='files with a label and an utterance on every line')
+    parser.add_argument('--model', type=Path, default=CHECKPOINT_LOCATION,
+                        help='the checkpoint of the model to update')
+    parsed = parser.parse_args(args)
+
+    if not parsed.model.is_file():
+        print(f'No model found at {parsed.model}. Run the online classifier once to train it.')
+        return 1
+    classifier = OnlineClassifier(location=parsed.model)
+    classifier.load(parsed.model)
+    records = list(iter_records(parsed.files))
+    classifier.partial_fit([x[1] for x in records], [x[0] for x in records])
+    classifier.checkpoint()
+    print(f'Learned {len(records)} utterances. Model saved to {parsed.model}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Registry of all available classifiers. The module of a classifier is only imported when it
+is selected, so that the dependencies of the other classifiers are never loaded.
+"""
+from typing import Dict, List, Tuple, Type
+
+from restaurant_assistant.import_budget import timed_import
+from restaurant_assistant.textclass.utterance_classifier import UtteranceClassifier
+
+CLASSIFIERS: Dict[str, Tuple[str, str]] = {
+    'neural_network': ('restaurant_assistant.textclass.neural_network_classifier',
+                       'NeuralNetworkClassifier'),
+    'numpy_network': ('restaurant_assistant.textclass.numpy_network_classifier',
+                      'NumpyNetworkClassifier'),
+    'decision_tree': ('restaurant_assistant.textclass.decision_tree_classifier',
+                      'DecisionTreeClassifier'),
+    'online': ('restaurant_assistant.textclass.online_classifier', 'OnlineClassifier'),
+    'keyword': ('restaurant_assistant.textclass.keyword_classifier', 'KeywordClassifier'),
+    'majority': ('restaurant_assistant.textclass.majority_classifier', 'MajorityClassifier'),
+}
+
+
+# Classifiers that load a model trained elsewhere instead of training on the given data.
+PRETRAINED = ('numpy_network',)
+
+
+def classifier_names() -> List[str]:
+    return list(CLASSIFIERS)
+
+
+def trainable_names() -> List[str]:
+    """
+    :return: the names of the classifiers that are trained on the data they are initialized
+        with
+    """
+    return [name for name in CLASSIFIERS if name not in PRETRAINED]
+
+
+def classifier_class(name: str) -> Type[UtteranceClassifier]:
+    """
+    Imports the module of the classifier and returns its class.
+
+    :param name: the registered name of the classifier
+    :return: the class of the classifier
+    """
+    try:
+        module_name, class_name = CLASSIFIERS[name]
+    except KeyError:
+        raise Exception(f'The given classifier, {name}, is unknown.')
+    return getattr(timed_import(module_name), class_name)
+
+
+def load_classifier(name: str, **kwargs) -> UtteranceClassifier:
+    """
+    Imports the module of the classifier and creates an instance of it.
+
+    :param name: the registered name of the classifier
+    :param kwargs: arguments passed on to the classifier
+    :return: the created classifier
+    """
+    return classifier_class(name)(**kwargs)
@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
 from enum import Enum, auto
+from typing import List, Sequence, Tuple
+import numpy
 from pandas.core.frame import DataFrame
-from sklearn.metrics._classification import f1_score, accuracy_score
 
 from restaurant_assistant.data_processing.data_loader import Column
 
@@ -48,16 +49,62 @@ class UtteranceClassifier(ABC):
         Classify the utterance as one of the utterance types and return the type.
         """
 
+    def classify_batch(self, utterances: Sequence[str]) -> List[UtteranceType]:
+        """
+        Classify all utterances at once and return their types in the same order. Classifiers
+        with a per call overhead should override this with a vectorized implementation.
+        """
+        return [self.classify(utterance) for utterance in utterances]
+
+    def classify_batch_proba(self, utterances: Sequence[str]) -> numpy.ndarray:
+        """
+        Return the probability of every utterance type for all utterances, as an array with
+        one row per utterance and one column per utterance type in enumeration order. By
+        default the classified type gets probability 1.
+        """
+        return one_hot([x.value - 1 for x in self.classify_batch(utterances)])
+
     def test_performance(self, test_data: DataFrame):
         """
         Test the performance of the classifier on various metrics.
         """
-        result = 'result'
-        test_data[result] = [self.classify(utterance).name
-                             for utterance in test_data[Column.utterance]]
+        result = [x.name for x in self.classify_batch(list(test_data[Column.utterance]))]
+        return score(test_data[Column.label], result)
+
+
+def score(labels: Sequence[str], predicted: Sequence[str]) -> Tuple[float, float]:
+    """
+    Computes the macro F1 score and the accuracy of predicted labels.
+
+    :param labels: the names of the true utterance types
+    :param predicted: the names of the predicted utterance types
+    :return: the F1 score and the accuracy
+    """
+    from sklearn.metrics import f1_score, accuracy_score
+
+    f1_result = f1_score(labels, predicted, average='macro',
+                         labels=[x.name for x in UtteranceType], zero_division=1)
+    acc_result = accuracy_score(labels, predicted)
+    return float(f1_result), float(acc_result)
+
+
+def one_hot(label_indices: Sequence[int]) -> numpy.ndarray:
+    """
+    Converts label indices into probability rows where the given label has probability 1.
+
+    :param label_indices: index of the utterance type of each row
+    :return: array of shape (number of rows, number of utterance types)
+    """
+    proba = numpy.zeros((len(label_indices), len(UtteranceType)), dtype=numpy.float32)
+    proba[numpy.arange(len(label_indices)), label_indices] = 1
+    return proba
 
-        f1_result = f1_score(test_data[Column.label], test_data[result], average='macro',
-                             labels=[x.name for x in UtteranceType], zero_division=1)
-        acc_result = accuracy_score(test_data[Column.label], test_data[result])
 
-        return f1_result, acc_result
+def types_from_proba(proba: numpy.ndarray) -> List[UtteranceType]:
+    """
+    Picks the most probable utterance type of each row.
+
+    :param proba: array of shape (number of rows, number of utterance types)
+    :return: the most probable type per row
+    """
+    return [UtteranceType(index + 1) for index in numpy.argmax(proba, axis=1)]
@@ -0,0 +1,249 @@
+from __future__ import annotations
+import json
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import numpy
+from scipy.sparse import csr_matrix
+
+
+UNKNOWN_INDEX = 0
+FEATURE_DTYPE = numpy.uint8
+INDEX_DTYPE = numpy.int32
+
+FEATURE_MODES = ('vocabulary', 'hashing')
+FEATURE_PARAMS = ('feature_mode', 'n_features', 'ngrams')
+N_FEATURES = 2 ** 14
+NGRAMS = 2
+
+
+class Vectorizer(ABC):
+    """
+    Converts utterances into sparse binary vectors, where every column that belongs to a
+    feature of the utterance is marked with 1.
+    """
+
+    @property
+    @abstractmethod
+    def size(self) -> int:
+        """
+        The number of columns.
+        """
+
+    @abstractmethod
+    def fit(self, utterances: Iterable[str]) -> Vectorizer:
+        """
+        Prepares the vectorizer for the given training utterances.
+
+        :param utterances: the training utterances
+        :return: the vectorizer itself
+        """
+
+    @abstractmethod
+    def indices(self, utterance: str) -> List[int]:
+        """
+        Looks up the columns of all features of the utterance.
+
+        :param utterance: string to be converted
+        :return: the sorted, unique columns that should be marked with 1
+        """
+
+    @abstractmethod
+    def get_state(self) -> Any:
+        """
+        :return: everything needed to convert utterances in the same way, as a json value
+        """
+
+    @abstractmethod
+    def set_state(self, state: Any) -> None:
+        """
+        Restores a state returned by get_state.
+        """
+
+    def transform(self, utterances: Iterable[str]) -> csr_matrix:
+        """
+        Converts the utterances into a sparse matrix with one row per utterance.
+
+        :param utterances: strings to be converted
+        :return: CSR matrix of shape (number of utterances, size)
+        """
+        indptr = [0]
+        indices = list()
+        for utterance in utterances:
+            indices.extend(self.indices(utterance))
+            indptr.append(len(indices))
+
+        data = numpy.ones(len(indices), dtype=FEATURE_DTYPE)
+        return csr_matrix((data, numpy.array(indices, dtype=INDEX_DTYPE),
+                           numpy.array(indptr, dtype=INDEX_DTYPE)),
+                          shape=(len(indptr) - 1, self.size))
+
+    def transform_one(self, utterance: str) -> csr_matrix:
+        """
+        Converts a single utterance into a sparse row.
+
+        :param utterance: string to be converted
+        :return: CSR matrix of shape (1, size)
+        """
+        return self.transform([utterance])
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the state to a json file.
+
+        :param path: the file to write
+        """
+        with open(path, 'w') as file:
+            json.dump(self.get_state(), file)
+
+    def load(self, path: Path) -> None:
+        """
+        Reads the state from a json file written by save.
+
+        :param path: the file to read
+        """
+        with open(path, 'r') as file:
+            self.set_state(json.load(file))
+
+
+class BagOfWordsVectorizer(Vectorizer):
+    """
+    Converts utterances into sparse binary bag-of-words vectors. Every known word is mapped to
+    its own column through a dict, words that were not seen while fitting are all marked in
+    column 0.
+
+    :var List[Optional[str]] words: all known words in column order. The first entry is None
+    :var Dict[str, int] vocabulary: maps each known word to its column
+    """
+
+    def __init__(self, words: Optional[List[Optional[str]]] = None):
+        self.words = list()
+        self.vocabulary = dict()
+        if words is not None:
+            self.set_words(words)
+
+    @property
+    def size(self) -> int:
+        return len(self.words)
+
+    def set_words(self, words: List[Optional[str]]) -> None:
+        """
+        Sets the known words and rebuilds the vocabulary.
+
+        :param words: the words in column order, starting with None
+        """
+        self.words = list(words)
+        self.vocabulary = {word: index for index, word in enumerate(self.words)
+                           if word is not None}
+
+    def fit(self, utterances: Iterable[str]) -> BagOfWordsVectorizer:
+        """
+        Creates the vocabulary out of all words in the given utterances.
+
+        :param utterances: the training utterances
+        :return: the vectorizer itself
+        """
+        all_words = sorted(set(word for utterance in utterances
+                               for word in utterance.lower().split()))
+        self.set_words([None] + all_words)
+        return self
+
+    def add_words(self, utterances: Iterable[str]) -> int:
+        """
+        Adds the words in the given utterances that are not known yet as new columns after the
+        existing ones, so that the columns of known words stay the same.
+
+        :param utterances: the utterances to take the words from
+        :return: the number of added words
+        """
+        if not self.words:
+            self.set_words([None])
+        new_words = sorted(set(word for utterance in utterances
+                               for word in utterance.lower().split()
+                               if word not in self.vocabulary))
+        for word in new_words:
+            self.vocabulary[word] = len(self.words)
+            self.words.append(word)
+        return len(new_words)
+
+    def indices(self, utterance: str) -> List[int]:
+        """
+        Looks up the columns of all words in the utterance.
+
+        :param utterance: string to be converted
+        :return: the sorted, unique columns that should be marked with 1
+        """
+        return sorted(set(self.vocabulary.get(word, UNKNOWN_INDEX)
+                          for word in utterance.lower().split()))
+
+    def get_state(self):
+        return self.words
+
+    def set_state(self, state):
+        self.set_words(state)
+
+
+class HashingVectorizer(Vectorizer):
+    """
+    Converts utterances into sparse binary vectors of a fixed size, by hashing every word and
+    every sequence of up to ngrams words into one of the columns. No vocabulary is kept, so the
+    size of the vectors and of the models using them does not grow with the training data,
+    and words that were not seen while training still get their own column. Different features
+    can end up in the same column.
+
+    :var int n_features: the number of columns
+    :var int ngrams: the longest sequence of words that is hashed
+    """
+
+    def __init__(self, n_features: int = N_FEATURES, ngrams: int = NGRAMS):
+        self.n_features = n_features
+        self.ngrams = ngrams
+
+    @property
+    def size(self) -> int:
+        return self.n_features
+
+    def fit(self, utterances):
+        return self
+
+    def indices(self, utterance):
+        words = utterance.lower().split()
+        features = list(words)
+        for length in range(2, self.ngrams + 1):
+            features.extend(' '.join(words[start:start + length])
+                            for start in range(len(words) - length + 1))
+        return sorted(set(zlib.crc32(feature.encode()) % self.n_features
+                          for feature in features))
+
+    def get_state(self):
+        return {'feature_mode': 'hashing', 'n_features': self.n_features,
+                'ngrams': self.ngrams}
+
+    def set_state(self, state):
+        self.n_features = state['n_features']
+        self.ngrams = state['ngrams']
+
+
+def feature_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    :return: the hyperparameters that decide how utterances are converted
+    """
+    return {key: params[key] for key in FEATURE_PARAMS if key in params}
+
+
+def create_vectorizer(params: Dict[str, Any]) -> Vectorizer:
+    """
+    Creates the vectorizer selected by the feature_mode hyperparameter: vocabulary for a
+    column per known word, or hashing for hashed words and word sequences.
+
+    :param params: hyperparameters, of which only feature_mode, n_features and ngrams are used
+    :return: the created vectorizer
+    """
+    mode = params.get('feature_mode', 'vocabulary')
+    if mode == 'vocabulary':
+        return BagOfWordsVectorizer()
+    elif mode == 'hashing':
+        return HashingVectorizer(params.get('n_features', N_FEATURES),
+                                 params.get('ngrams', NGRAMS))
+    raise Exception(f'The given feature mode, {mode}, is unknown.')
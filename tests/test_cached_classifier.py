@@ -0,0 +1,40 @@
+from restaurant_assistant.textclass.cached_classifier import CachedClassifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType
+
+
+class RecordingClassifier:
+    """
+    Classifies utterances with a question mark as requests, and remembers what it was given.
+    """
+
+    def __init__(self):
+        self.seen = list()
+
+    def classify(self, utterance):
+        self.seen.append(utterance)
+        return UtteranceType.request if '?' in utterance else UtteranceType.inform
+
+    def classify_batch(self, utterances):
+        return [self.classify(utterance) for utterance in utterances]
+
+
+def test_model_gets_the_original_utterance():
+    model = RecordingClassifier()
+    cached = CachedClassifier(model)
+    assert cached.classify('phone number?') is UtteranceType.request
+    assert cached.classify('phone number') is UtteranceType.inform
+    assert model.seen == ['phone number?', 'phone number']
+
+
+def test_normalized_keys_are_opt_in():
+    model = RecordingClassifier()
+    cached = CachedClassifier(model, normalize_keys=True)
+    cached.classify_batch(['thank you!', 'thank you', 'thank  you'])
+    assert model.seen == ['thank you!']
+
+
+def test_hits_and_misses_are_counted_per_utterance():
+    cached = CachedClassifier(RecordingClassifier())
+    cached.classify_batch(['yes', 'yes', 'no'])
+    cached.classify_batch(['yes'])
+    assert (cached.hits, cached.misses) == (2, 2)
@@ -0,0 +1,17 @@
+import pytest
+
+from restaurant_assistant.data_processing.corpus import Corpus, MAX_LABELS
+from restaurant_assistant.data_processing.data_loader import Column, corpus_dataframe
+
+
+def test_corpus_gives_back_the_exact_records():
+    records = [('inform', 'i want  thai food'), ('bye', 'bye'), ('inform', 'thai')]
+    corpus = Corpus.build(records)
+    assert list(corpus) == records
+    data = corpus_dataframe(corpus)
+    assert list(data[Column.utterance]) == [x[1] for x in records]
+
+
+def test_too_many_labels_give_a_clear_error():
+    with pytest.raises(ValueError, match='different labels'):
+        Corpus.build((f'label{index}', 'hello') for index in range(MAX_LABELS + 1))
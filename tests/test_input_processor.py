@@ -0,0 +1,22 @@
+from restaurant_assistant.dialog.input_processor import KeywordIndex, find_keywords
+from restaurant_assistant.order_reasoning.info_type import InfoType
+from restaurant_assistant.order_reasoning.order import Order
+
+
+def test_fuzzy_match_only_compares_phrases_with_as_many_words():
+    index = KeywordIndex(['korean', 'modern european'])
+    assert index.find_closest('looking for an expensive restaurant'.split()) == (3, None)
+    assert index.find_closest('i want modren european food'.split()) == (2, 'modern european')
+
+
+def test_unknown_food_is_not_matched_to_a_similar_phrase():
+    order = Order(3)
+    changes = order.process_inform('im looking for an expensive restaurant serving english food')
+    assert changes == [(InfoType.pricerange, 'expensive')]
+    assert order.preference[InfoType.food] is None
+
+
+def test_misspelled_food_is_matched():
+    matches = find_keywords({InfoType.food: ['chinese', 'korean']},
+                            {InfoType.food: ['food']}, 'i want chinees food')
+    assert matches == [(InfoType.food, 'chinese')]
@@ -0,0 +1,37 @@
+import pandas
+
+from restaurant_assistant.data_processing.data_loader import Column
+from restaurant_assistant.textclass.artifact_store import ArtifactStore
+from restaurant_assistant.textclass.cached_classifier import CachedClassifier
+from restaurant_assistant.textclass.online_classifier import OnlineClassifier
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType
+
+
+DATA = pandas.DataFrame({Column.label: ['affirm', 'negate', 'bye'] * 5,
+                         Column.utterance: ['yes', 'no', 'goodbye'] * 5})
+
+
+def test_running_classifier_loads_a_replaced_checkpoint(tmp_path):
+    location = tmp_path.joinpath('online.npz')
+    store = ArtifactStore(tmp_path)
+    updater = OnlineClassifier(store=store, location=location)
+    updater.initialize(DATA)
+    running = CachedClassifier(OnlineClassifier(store=store, location=location))
+    running.initialize(DATA)
+    assert running.classify('thanks') is not UtteranceType.thankyou
+
+    updater.partial_fit(['thanks'] * 50, ['thankyou'] * 50)
+    updater.checkpoint()
+    assert running.classify('thanks') is UtteranceType.thankyou
+    assert running.artifact_key == updater.artifact_key
+
+
+def test_key_differs_for_models_with_as_many_updates(tmp_path):
+    first = OnlineClassifier(store=ArtifactStore(tmp_path), location=tmp_path.joinpath('a.npz'))
+    second = OnlineClassifier(store=ArtifactStore(tmp_path), location=tmp_path.joinpath('b.npz'))
+    first.initialize(DATA)
+    second.initialize(DATA)
+    first.partial_fit(['yes'], ['affirm'])
+    second.partial_fit(['no'], ['negate'])
+    assert first.updates == second.updates
+    assert first.artifact_key != second.artifact_key
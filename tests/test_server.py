@@ -0,0 +1,43 @@
+import asyncio
+
+from restaurant_assistant.server import DialogServer
+from restaurant_assistant.textclass.utterance_classifier import UtteranceType
+
+
+class FixedScheduler:
+    """
+    Classifies every utterance as the given type, optionally running a callback first.
+    """
+
+    def __init__(self, utterance_type, callback=None):
+        self.utterance_type = utterance_type
+        self.callback = callback
+
+    async def classify(self, utterance):
+        if self.callback is not None:
+            self.callback()
+        return self.utterance_type
+
+    def close(self):
+        pass
+
+
+def test_profile_name_does_not_use_the_session_id(tmp_path):
+    server = DialogServer(None, 3, False, scheduler=FixedScheduler(UtteranceType.hello),
+                          profile_dir=tmp_path)
+    first = asyncio.run(server.handle_request({'session': '../../x', 'profile': True}))
+    assert first['profile'].isalnum()
+    asyncio.run(server.handle_request({'session': '../../x', 'utterance': 'hello'}))
+    server.close_session('../../x')
+    assert [x.name for x in tmp_path.iterdir()] == [f'{first["profile"]}.prof']
+
+
+def test_closing_a_removed_session_does_nothing(tmp_path):
+    scheduler = FixedScheduler(UtteranceType.hello)
+    server = DialogServer(None, 3, False, scheduler=scheduler, profile_dir=tmp_path)
+    asyncio.run(server.handle_request({'session': 'a', 'profile': True}))
+    scheduler.callback = lambda: server.close_session('a')
+    asyncio.run(server.handle_request({'session': 'a', 'utterance': 'hello'}))
+    server.close_session('a')
+    assert not server.sessions
+    assert len(list(tmp_path.iterdir())) == 1
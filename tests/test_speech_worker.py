@@ -0,0 +1,38 @@
+import threading
+
+from restaurant_assistant.speech.audio_cache import AudioCache
+from restaurant_assistant.speech.backends import LocalBackend
+from restaurant_assistant.speech.worker import SpeechWorker
+
+
+class BlockingPlayer:
+    """
+    Records the played texts, and blocks on the first one until it is released.
+    """
+
+    def __init__(self):
+        self.played = list()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def play(self, path):
+        self.played.append(path.read_bytes())
+        self.started.set()
+        self.release.wait()
+
+
+def test_prefetches_are_dropped_before_texts_to_speak(tmp_path):
+    player = BlockingPlayer()
+    worker = SpeechWorker(LocalBackend(), AudioCache(tmp_path), player, queue_size=2)
+    worker.say('one')
+    assert player.started.wait(5)
+    worker.prefetch(['later'])
+    worker.say('two words')
+    worker.say('three more words')
+    player.release.set()
+    worker.close()
+
+    backend = LocalBackend()
+    assert worker.dropped == 1
+    assert player.played == [backend.synthesize(x) for x in ['one', 'two words',
+                                                              'three more words']]